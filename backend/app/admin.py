@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.models import User
-from .models import Category, Product, Retailer, Order, Employee, Truck, Shipment
+from .models import Category, Product, Retailer, Order, Employee, Truck, Shipment, AllocationJob, StockMovement, StockSnapshot, CategoryStockSummary, StockAlertRule, StockAlert, ProductForecast
 
 # ✅ Category Admin
 @admin.register(Category)
@@ -20,7 +20,7 @@ class ProductAdmin(admin.ModelAdmin):
 # ✅ Order Admin
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ('order_id', 'retailer', 'product', 'required_qty', 'status', 'order_date')  # Changed 'id' to 'order_id'
+    list_display = ('order_id', 'retailer', 'product', 'required_qty', 'allocated_qty', 'status', 'order_date')  # Changed 'id' to 'order_id'
     search_fields = ('product__name', 'retailer__name')
     list_filter = ('status', 'order_date')
 
@@ -47,13 +47,73 @@ class RetailerAdmin(admin.ModelAdmin):
 # ✅ Truck Admin
 @admin.register(Truck)
 class TruckAdmin(admin.ModelAdmin):
-    list_display = ('truck_id', 'license_plate', 'capacity', 'is_available')  # Changed 'id' to 'truck_id'
+    list_display = ('truck_id', 'license_plate', 'capacity', 'remaining_capacity', 'in_transit_count', 'is_available')  # Changed 'id' to 'truck_id'
     search_fields = ('license_plate',)
 
 
 # ✅ Shipment Admin
 @admin.register(Shipment)
 class ShipmentAdmin(admin.ModelAdmin):
-    list_display = ('shipment_id', 'order', 'employee', 'status', 'shipment_date')  # Changed 'id' to 'shipment_id'
+    list_display = ('shipment_id', 'order', 'employee', 'quantity', 'status', 'shipment_date')  # Changed 'id' to 'shipment_id'
     search_fields = ('order__order_id', 'employee__user__username')  # Fetch employee name properly
     list_filter = ('status', 'shipment_date')
+
+
+# ✅ Allocation Job Admin
+@admin.register(AllocationJob)
+class AllocationJobAdmin(admin.ModelAdmin):
+    list_display = ('job_id', 'status', 'strategy', 'orders_processed', 'shipments_created', 'created_at', 'finished_at')
+    list_filter = ('status',)
+
+
+# ✅ Stock Ledger Admin (read only, movements are append-only)
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ('movement_id', 'product', 'kind', 'available_delta', 'required_delta', 'shipped_delta', 'reference', 'created_at')
+    list_filter = ('kind',)
+    search_fields = ('product__name', 'reference')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('snapshot_id', 'product', 'available_quantity', 'total_required_quantity', 'total_shipped', 'taken_at')
+    search_fields = ('product__name',)
+
+
+# ✅ Category Stock Summary Admin (maintained automatically)
+@admin.register(CategoryStockSummary)
+class CategoryStockSummaryAdmin(admin.ModelAdmin):
+    list_display = ('category', 'product_count', 'on_demand_count', 'available_quantity', 'total_required_quantity', 'total_shipped', 'updated_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# ✅ Stock Alert Admin
+@admin.register(StockAlertRule)
+class StockAlertRuleAdmin(admin.ModelAdmin):
+    list_display = ('rule_id', 'product', 'category', 'min_available', 'alert_on_demand', 'below_reorder_point', 'is_active')
+    list_filter = ('is_active', 'alert_on_demand')
+
+
+@admin.register(StockAlert)
+class StockAlertAdmin(admin.ModelAdmin):
+    list_display = ('alert_id', 'product', 'kind', 'available_quantity', 'total_required_quantity', 'created_at', 'resolved_at')
+    list_filter = ('kind', 'resolved_at')
+    search_fields = ('product__name',)
+
+
+# ✅ Product Forecast Admin (written by the forecast_demand command)
+@admin.register(ProductForecast)
+class ProductForecastAdmin(admin.ModelAdmin):
+    list_display = ('product', 'daily_demand', 'demand_std', 'safety_stock', 'reorder_point', 'lead_time_days', 'computed_at')
+    search_fields = ('product__name',)
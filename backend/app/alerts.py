@@ -0,0 +1,104 @@
+import json
+import logging
+import threading
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Product, StockAlert, StockAlertRule
+from .stock import batches
+
+logger = logging.getLogger(__name__)
+
+
+def _firing(rule, available, required, status, reorder_point):
+    """The alert kinds ``rule`` raises for a product in this state."""
+    kinds = []
+    if rule.min_available is not None and available < rule.min_available:
+        kinds.append('low_stock')
+    if rule.alert_on_demand and status == 'on_demand':
+        kinds.append('on_demand')
+    if rule.below_reorder_point and reorder_point is not None and available < reorder_point:
+        kinds.append('reorder')
+    return kinds
+
+
+def evaluate_stock_alerts(product_ids):
+    """
+    Re-evaluates the alert rules of the given products only, opening alerts
+    whose condition now holds and resolving those whose condition cleared.
+
+    Per batch of products: one read of the matching active rules (and nothing
+    more when there are none), one read of the products, one read of their
+    open alerts, then at most one INSERT and one UPDATE. New alerts are
+    published over MQTT after commit when STOCK_ALERT_MQTT_TOPIC is set.
+    Returns the alerts opened.
+    """
+    opened = []
+    for batch in batches(set(product_ids)):
+        categories = Product.objects.filter(product_id__in=batch).values('category_id')
+        rules = list(StockAlertRule.objects.filter(
+            Q(product_id__in=batch) | Q(category_id__in=categories), is_active=True,
+        ))
+        if not rules:
+            continue
+
+        rows = Product.objects.filter(product_id__in=batch).values_list(
+            'product_id', 'category_id', 'available_quantity', 'total_required_quantity', 'status',
+            'forecast__reorder_point',
+        )
+        firing = {}
+        for product_id, category_id, available, required, status, reorder_point in rows:
+            for rule in rules:
+                if rule.product_id == product_id or rule.category_id == category_id:
+                    for kind in _firing(rule, available, required, status, reorder_point):
+                        firing[(rule.rule_id, product_id, kind)] = (available, required)
+
+        open_alerts = dict(
+            ((rule_id, product_id, kind), alert_id)
+            for alert_id, rule_id, product_id, kind in StockAlert.objects.filter(
+                rule__in=rules, product_id__in=batch, resolved_at__isnull=True,
+            ).values_list('alert_id', 'rule_id', 'product_id', 'kind')
+        )
+
+        cleared = [alert_id for key, alert_id in open_alerts.items() if key not in firing]
+        if cleared:
+            StockAlert.objects.filter(alert_id__in=cleared).update(resolved_at=timezone.now())
+
+        new_alerts = [
+            StockAlert(
+                rule_id=rule_id, product_id=product_id, kind=kind,
+                available_quantity=available, total_required_quantity=required,
+            )
+            for (rule_id, product_id, kind), (available, required) in firing.items()
+            if (rule_id, product_id, kind) not in open_alerts
+        ]
+        if new_alerts:
+            # A concurrent writer may have opened the same alert; the partial unique index keeps one
+            StockAlert.objects.bulk_create(new_alerts, ignore_conflicts=True)
+            opened.extend(new_alerts)
+
+    if opened and getattr(settings, "STOCK_ALERT_MQTT_TOPIC", None):
+        payload = [
+            {"product_id": alert.product_id, "rule_id": alert.rule_id, "kind": alert.kind,
+             "available_quantity": alert.available_quantity, "total_required_quantity": alert.total_required_quantity}
+            for alert in opened
+        ]
+        transaction.on_commit(lambda: publish_alerts(payload))
+    return opened
+
+
+def publish_alerts(payload):
+    """Publishes alert events to the configured MQTT topic from a background thread."""
+
+    def publish():
+        try:
+            import paho.mqtt.publish as mqtt_publish
+            mqtt_publish.single(
+                settings.STOCK_ALERT_MQTT_TOPIC, json.dumps(payload), qos=1,
+                hostname=settings.STOCK_ALERT_MQTT_BROKER, port=settings.STOCK_ALERT_MQTT_PORT,
+            )
+        except Exception:
+            logger.exception("Publishing stock alerts over MQTT failed")
+
+    threading.Thread(target=publish, daemon=True).start()
@@ -1,107 +1,787 @@
+import bisect
 import logging
+import time
+from collections import namedtuple
+import numpy as np
+from django.conf import settings
 from django.db import transaction
-from django.db.models import F
+from django.db.models import Case, F, IntegerField, PositiveIntegerField, Q, Value, When
+from django.db.models.functions import Greatest, Least
 from rest_framework.response import Response
-from .models import Order, Employee, Shipment, Product
+from .cache import bump, ORDERS, PRODUCTS, SHIPMENTS, TRUCKS
+from .models import Order, Employee, Shipment, Truck
+from .stock import adjust_quantities, batches, refresh_product_status
+from .forecasting import reorder_points
 
 logger = logging.getLogger(__name__)
 
-def allocate_shipments(request):
+# Plain-tuple views of the rows the allocation engine works on. Strategies only
+# ever see these, never model instances, so planning stays free of queries.
+# PendingOrder.required_qty is the quantity still to allocate (see Order.outstanding_qty).
+PendingOrder = namedtuple("PendingOrder", ["order_id", "product_id", "required_qty", "distance", "order_date"])
+TruckSlot = namedtuple("TruckSlot", ["employee_id", "truck_id", "capacity"])
+Allocation = namedtuple("Allocation", ["order_id", "product_id", "employee_id", "quantity"])
+
+
+INSUFFICIENT_STOCK = "Insufficient stock"
+NO_SUITABLE_TRUCK = "No suitable truck available"
+PARTIALLY_ALLOCATED = "Partially allocated"
+
+
+class AllocationError(Exception):
+    """Raised when an allocation run cannot be started."""
+
+
+class StockConflict(Exception):
+    """Raised when a guarded stock decrement finds less stock than was planned for."""
+
+
+# ===================== FLEETS =====================
+
+class FirstFitFleet:
+    """Trucks are scanned in a fixed order and the first one with room wins (O(m) per order)."""
+
+    def __init__(self, trucks):
+        self.trucks = list(trucks)
+        self.remaining = [truck.capacity for truck in self.trucks]
+
+    def take(self, quantity):
+        for index, room in enumerate(self.remaining):
+            if room >= quantity:
+                self.remaining[index] -= quantity
+                return self.trucks[index]
+        return None
+
+    def rooms(self):
+        return {truck.employee_id: room for truck, room in zip(self.trucks, self.remaining)}
+
+
+class BestFitFleet:
     """
-    Allocate shipments dynamically based on truck capacity, retailer distance, and product stock.
+    Remaining capacities are kept in a sorted list of (room, index) pairs.
+    The truck with the smallest room that still fits is found by bisection (O(log m)).
     """
-    allocated_orders = []
-    skipped_orders = []
 
+    def __init__(self, trucks):
+        self.trucks = list(trucks)
+        self.sorted_rooms = sorted((truck.capacity, index) for index, truck in enumerate(self.trucks) if truck.capacity > 0)
+
+    def take(self, quantity):
+        position = bisect.bisect_left(self.sorted_rooms, (quantity,))
+        if position == len(self.sorted_rooms):
+            return None
+
+        room, index = self.sorted_rooms.pop(position)
+        if room > quantity:
+            bisect.insort(self.sorted_rooms, (room - quantity, index))
+        return self.trucks[index]
+
+    def rooms(self):
+        return {self.trucks[index].employee_id: room for room, index in self.sorted_rooms}
+
+
+# ===================== STRATEGIES =====================
+
+class AllocationStrategy:
+    """
+    Base class for allocation strategies.
+
+    A strategy decides in which sequence pending orders are considered and which
+    fleet picks the truck for each of them. Orders no single truck can take are
+    then split over the room left in several trucks, unless ``split_orders`` is
+    off. ``plan`` works purely in memory.
+    """
+    name = None
+    fleet_class = None
+    split_orders = True
+
+    def order_sequence(self, orders):
+        return orders
+
+    def plan(self, orders, trucks, stock):
+        """
+        Returns (allocations, skipped_orders) for the given pending orders.
+
+        ``stock`` maps product_id -> available quantity and is decremented in place.
+        An order split across trucks yields one Allocation per truck.
+        """
+        allocations, skipped_orders, rooms = self.place(orders, trucks, stock)
+        if self.split_orders:
+            split_allocations, skipped_orders = split_unplaced(orders, skipped_orders, rooms, stock)
+            allocations.extend(split_allocations)
+        return allocations, skipped_orders
+
+    def place(self, orders, trucks, stock):
+        """
+        Places whole orders. Returns (allocations, skipped_orders, rooms), where
+        ``rooms`` maps employee_id -> capacity left on that truck.
+        """
+        fleet = self.fleet_class(trucks)
+        allocations = []
+        skipped_orders = []
+
+        for order in self.order_sequence(orders):
+            if stock.get(order.product_id, 0) < order.required_qty:
+                skipped_orders.append({"order_id": order.order_id, "reason": INSUFFICIENT_STOCK})
+                continue
+
+            truck = fleet.take(order.required_qty)
+            if truck is None:
+                skipped_orders.append({"order_id": order.order_id, "reason": NO_SUITABLE_TRUCK})
+                continue
+
+            stock[order.product_id] -= order.required_qty
+            allocations.append(Allocation(order.order_id, order.product_id, truck.employee_id, order.required_qty))
+
+        return allocations, skipped_orders, fleet.rooms()
+
+
+def split_unplaced(orders, skipped_orders, rooms, stock):
+    """
+    Spreads orders that no single truck could take over the room left in several.
+
+    Trucks are filled largest room first and the last part goes to the tightest
+    room that fits it, so each order is cut into as few shipments as possible.
+    When the fleet cannot take an order in full, what fits is allocated and the
+    rest stays pending. Returns (allocations, skipped_orders).
+    """
+    orders_by_id = {order.order_id: order for order in orders}
+    free = sorted((room, employee_id) for employee_id, room in rooms.items() if room > 0)
+    allocations = []
+    still_skipped = []
+
+    for skipped in skipped_orders:
+        order = orders_by_id[skipped["order_id"]]
+        if skipped["reason"] != NO_SUITABLE_TRUCK or not free or stock.get(order.product_id, 0) < order.required_qty:
+            still_skipped.append(skipped)
+            continue
+
+        remaining = order.required_qty
+        while remaining and free:
+            position = bisect.bisect_left(free, (remaining,))
+            if position < len(free):
+                room, employee_id = free.pop(position)
+                part = remaining
+            else:
+                room, employee_id = free.pop()
+                part = room
+
+            if room > part:
+                bisect.insort(free, (room - part, employee_id))
+            allocations.append(Allocation(order.order_id, order.product_id, employee_id, part))
+            remaining -= part
+
+        stock[order.product_id] -= order.required_qty - remaining
+        if remaining:
+            still_skipped.append({"order_id": order.order_id, "reason": PARTIALLY_ALLOCATED, "unallocated_qty": remaining})
+
+    return allocations, still_skipped
+
+
+class FirstFitStrategy(AllocationStrategy):
+    """Oldest orders first, each on the first truck with enough room (the original behaviour, orders are never split)."""
+    name = "first_fit"
+    fleet_class = FirstFitFleet
+    split_orders = False
+
+    def order_sequence(self, orders):
+        return sorted(orders, key=lambda order: (order.order_date, order.order_id))
+
+
+class BestFitDecreasingStrategy(AllocationStrategy):
+    """Largest orders first, each on the truck whose remaining room fits it most tightly."""
+    name = "best_fit_decreasing"
+    fleet_class = BestFitFleet
+
+    def order_sequence(self, orders):
+        return sorted(orders, key=lambda order: (-order.required_qty, order.order_date, order.order_id))
+
+
+class DistanceClusteredStrategy(AllocationStrategy):
+    """
+    Loads one truck at a time with orders from a single distance band.
+
+    Pending orders are bucketed into bands of ``band_km`` kilometres using
+    Retailer.distance_from_warehouse. Each truck (largest first) is seeded with the
+    band holding the most deliverable demand, then filled with the best-scoring
+    orders: nearest band first, tightest fit second, oldest order on ties.
+    Scores are computed with NumPy over the whole backlog at once.
+    """
+    name = "distance_clustered"
+    band_km = 10.0
+
+    def place(self, orders, trucks, stock):
+        orders = sorted(orders, key=lambda order: (order.order_date, order.order_id))
+        rooms = {truck.employee_id: truck.capacity for truck in trucks}
+        if not orders:
+            return [], [], rooms
+
+        count = len(orders)
+        quantities = np.fromiter((order.required_qty for order in orders), dtype=np.int64, count=count)
+        distances = np.fromiter((order.distance or 0.0 for order in orders), dtype=np.float64, count=count)
+        bands = np.maximum(np.floor(distances / self.band_km), 0).astype(np.int64)
+
+        product_ids = sorted({order.product_id for order in orders})
+        product_index = {product_id: index for index, product_id in enumerate(product_ids)}
+        products = np.fromiter((product_index[order.product_id] for order in orders), dtype=np.int64, count=count)
+        stock_left = np.array([stock.get(product_id, 0) for product_id in product_ids], dtype=np.int64)
+
+        unplaced = np.ones(count, dtype=bool)
+        allocations = []
+
+        for truck in sorted(trucks, key=lambda truck: -truck.capacity):
+            room = truck.capacity
+            seed_band = None
+
+            while room > 0:
+                feasible = unplaced & (quantities <= room) & (quantities <= stock_left[products])
+                if not feasible.any():
+                    break
+
+                if seed_band is None:
+                    demand = np.bincount(bands[feasible], weights=quantities[feasible])
+                    seed_band = int(np.argmax(demand))
+
+                score = np.abs(bands - seed_band) * (truck.capacity + 1) + (room - quantities)
+                index = int(np.argmin(np.where(feasible, score, np.iinfo(np.int64).max)))
+
+                order = orders[index]
+                unplaced[index] = False
+                room -= order.required_qty
+                stock_left[products[index]] -= order.required_qty
+                allocations.append(Allocation(order.order_id, order.product_id, truck.employee_id, order.required_qty))
+
+            rooms[truck.employee_id] = room
+
+        for product_id, index in product_index.items():
+            stock[product_id] = int(stock_left[index])
+
+        short = quantities > stock_left[products]
+        skipped_orders = [
+            {"order_id": orders[index].order_id, "reason": INSUFFICIENT_STOCK if short[index] else NO_SUITABLE_TRUCK}
+            for index in np.flatnonzero(unplaced)
+        ]
+        return allocations, skipped_orders, rooms
+
+
+STRATEGIES = {
+    strategy.name: strategy
+    for strategy in (FirstFitStrategy, BestFitDecreasingStrategy, DistanceClusteredStrategy)
+}
+DEFAULT_STRATEGY = BestFitDecreasingStrategy.name
+
+
+def get_strategy(name=None):
+    """Returns a strategy instance by name, falling back to DEFAULT_STRATEGY."""
     try:
-        with transaction.atomic():
-            # Fetch all pending orders with related product and retailer
-            orders = Order.objects.filter(status='pending').select_related('product', 'retailer').order_by('order_date')
+        return STRATEGIES[name or DEFAULT_STRATEGY]()
+    except KeyError:
+        raise ValueError(f"Unknown allocation strategy '{name}'. Choose one of: {', '.join(sorted(STRATEGIES))}")
+
+
+# ===================== ALLOCATION RUN =====================
+
+BULK_BATCH_SIZE = 1000
+
+
+def load_pending_orders(orders=None, lock=False, limit=None):
+    """
+    Returns (pending_orders, stock) for every pending order in one query.
+
+    ``orders`` optionally narrows the Order queryset that is read. With ``lock``
+    the order rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so rows
+    another worker holds are left to it. ``stock`` maps product_id -> available
+    quantity for the products involved.
+    """
+    if orders is None:
+        orders = Order.objects.all()
+    if lock:
+        orders = orders.select_for_update(skip_locked=True, of=('self',))
+
+    rows = (
+        orders.filter(status='pending')
+        .annotate(outstanding_qty=F('required_qty') - F('allocated_qty'))
+        .order_by('order_date', 'order_id')
+        .values_list('order_id', 'product_id', 'outstanding_qty', 'retailer__distance_from_warehouse', 'order_date',
+                     'product__available_quantity')
+    )
+    if limit is not None:
+        rows = rows[:limit]
+
+    pending_orders = []
+    stock = {}
+    for *fields, available_quantity in rows:
+        order = PendingOrder(*fields)
+        pending_orders.append(order)
+        stock[order.product_id] = available_quantity
+    return pending_orders, stock
+
+
+def load_available_trucks(employees=None, lock=False, limit=None):
+    """
+    Returns a TruckSlot for every employee whose truck has no shipment in transit,
+    read straight from the truck's maintained in_transit_count.
 
-            # Get truck IDs currently in transit
-            assigned_truck_ids = set(
-                Shipment.objects.filter(status='in_transit').values_list('employee__truck__truck_id', flat=True)
+    ``employees`` optionally narrows the Employee queryset that is read. With
+    ``lock`` the employee rows are claimed with SKIP LOCKED, so two workers never
+    load the same truck; ``limit`` caps how many are claimed.
+    """
+    if employees is None:
+        employees = Employee.objects.all()
+    if lock:
+        employees = employees.select_for_update(skip_locked=True, of=('self',))
+
+    rows = (
+        employees.filter(truck__isnull=False, truck__in_transit_count=0)
+        .values_list('employee_id', 'truck__truck_id', 'truck__remaining_capacity')
+        .order_by('employee_id')
+    )
+    if limit is not None:
+        rows = rows[:limit]
+    return [TruckSlot(*row) for row in rows]
+
+
+def commit_plan(allocations, outstanding, touched_product_ids=()):
+    """
+    Writes an allocation plan with a fixed number of statements:
+
+    - one bulk INSERT of shipments,
+    - one UPDATE marking fully allocated orders, one for partially allocated ones,
+    - one locking read and one guarded UPDATE decrementing stock, aggregated
+      per product, and one INSERT recording it in the stock ledger,
+    - status refreshes limited to the products involved,
+    - one read of the employees' trucks and one UPDATE of their in-transit
+      counters (which also marks them busy).
+
+    ``outstanding`` maps order_id -> quantity that was still to allocate; an order
+    only becomes 'allocated' once this run covers all of it.
+    The stock decrement only applies where enough stock is left; if any product
+    fell short in the meantime StockConflict is raised and the caller's
+    transaction must be rolled back.
+    Order and Shipment save signals are bypassed on purpose; their side effects
+    (product status, truck loads) are applied here in bulk instead.
+    Returns the created shipment ids, in the same order as ``allocations``.
+    """
+    product_ids = set(touched_product_ids)
+    if not allocations and not product_ids:
+        return []
+
+    shipments = Shipment.objects.bulk_create(
+        [Shipment(order_id=allocation.order_id, employee_id=allocation.employee_id, quantity=allocation.quantity, status='in_transit')
+         for allocation in allocations],
+        batch_size=BULK_BATCH_SIZE,
+    )
+
+    placed = {}
+    for allocation in allocations:
+        placed[allocation.order_id] = placed.get(allocation.order_id, 0) + allocation.quantity
+
+    complete = [order_id for order_id, quantity in placed.items() if quantity >= outstanding[order_id]]
+    for order_ids in batches(complete):
+        Order.objects.filter(order_id__in=order_ids).update(status='allocated', allocated_qty=F('required_qty'))
+
+    partial = [order_id for order_id, quantity in placed.items() if quantity < outstanding[order_id]]
+    for order_ids in batches(partial):
+        Order.objects.filter(order_id__in=order_ids).update(
+            allocated_qty=F('allocated_qty') + Case(
+                *[When(order_id=order_id, then=Value(placed[order_id])) for order_id in order_ids],
+                output_field=PositiveIntegerField(),
+            )
+        )
+
+    # One aggregated, guarded decrement per product (also refreshes their status)
+    totals = {}
+    for allocation in allocations:
+        totals[allocation.product_id] = totals.get(allocation.product_id, 0) + allocation.quantity
+    updated = adjust_quantities(
+        {product_id: {"available_quantity": -total} for product_id, total in totals.items()},
+        guard=True, kind="shipment", reference="allocation",
+    )
+    if updated != len(totals):
+        raise StockConflict(f"Stock changed for {len(totals) - updated} product(s) during allocation")
+
+    # Products skipped for stock may have gone on demand
+    refresh_product_status(product_ids - set(totals))
+
+    loads = {}
+    for allocation in allocations:
+        count, quantity = loads.get(allocation.employee_id, (0, 0))
+        loads[allocation.employee_id] = (count + 1, quantity + allocation.quantity)
+    adjust_truck_loads(loads)
+
+    bump(ORDERS, SHIPMENTS, PRODUCTS)
+    return [shipment.shipment_id for shipment in shipments]
+
+
+def adjust_truck_loads(loads):
+    """
+    Applies in-transit deltas to the trucks of the given employees.
+
+    ``loads`` maps employee_id -> (shipment count delta, quantity delta).
+    One read of the employees' trucks, then one CASE-based UPDATE per batch
+    that keeps in_transit_count, remaining_capacity and is_available in step.
+    """
+    loads = {employee_id: load for employee_id, load in loads.items() if any(load)}
+    if not loads:
+        return
+
+    per_truck = {}
+    for batch in batches(loads):
+        rows = Employee.objects.filter(employee_id__in=batch, truck__isnull=False).values_list('employee_id', 'truck_id')
+        for employee_id, truck_id in rows:
+            count, quantity = per_truck.get(truck_id, (0, 0))
+            per_truck[truck_id] = (count + loads[employee_id][0], quantity + loads[employee_id][1])
+
+    for truck_ids in batches(per_truck):
+        count, quantity = [
+            Case(
+                *[When(truck_id=truck_id, then=Value(per_truck[truck_id][index])) for truck_id in truck_ids],
+                default=Value(0),
+                output_field=IntegerField(),
             )
+            for index in (0, 1)
+        ]
+        Truck.objects.filter(truck_id__in=truck_ids).update(
+            in_transit_count=Greatest(F('in_transit_count') + count, Value(0)),
+            remaining_capacity=Greatest(Least(F('remaining_capacity') - quantity, F('capacity')), Value(0)),
+            is_available=Case(
+                When(in_transit_count__lte=Value(0) - count, then=Value(True)),
+                default=Value(False),
+            ),
+        )
+    bump(TRUCKS)
 
-            # Get employees who have available trucks
-            available_employees = Employee.objects.exclude(truck__truck_id__in=assigned_truck_ids).select_related('truck')
 
-            if not available_employees.exists():
-                return Response({"error": "No available employees with trucks"}, status=400)
+DEFAULT_CHUNK_SIZE = 500
+STOCK_CONFLICT_RETRIES = 3
 
-            # Map truck capacities
-            truck_capacity_map = {emp.truck.truck_id: emp.truck.capacity for emp in available_employees}
 
-            for order in orders:
-                product = order.product
-                retailer = order.retailer
+def get_chunk_size(value=None):
+    """Parses a requested chunk size, falling back to DEFAULT_CHUNK_SIZE; raises ValueError unless it is an integer >= 1."""
+    if value is None or value == "":
+        return DEFAULT_CHUNK_SIZE
+    try:
+        if isinstance(value, (bool, float)):
+            raise TypeError
+        chunk_size = int(value)
+    except (TypeError, ValueError):
+        chunk_size = 0
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be a positive integer, got {value!r}")
+    return chunk_size
 
-                if not product or not retailer:
-                    skipped_orders.append({"order_id": order.order_id, "reason": "Invalid product or retailer"})
-                    continue
 
-                if product.available_quantity < order.required_qty:
-                    skipped_orders.append({"order_id": order.order_id, "reason": "Insufficient stock"})
+def _commit(pending_orders, allocations, skipped_orders):
+    """Commits a plan for the given pending orders; returns the shipment ids."""
+    product_of = {order.order_id: order.product_id for order in pending_orders}
+    outstanding = {order.order_id: order.required_qty for order in pending_orders}
+    short_product_ids = {product_of[skipped["order_id"]] for skipped in skipped_orders if skipped["reason"] == INSUFFICIENT_STOCK}
+    return commit_plan(allocations, outstanding, short_product_ids)
 
-                    # ❌ Removed: No need to update total_required_quantity here (was causing double count)
 
-                    # Refresh and update status
-                    product.refresh_from_db()
-                    product.update_status()
-                    product.save(update_fields=['status'])
+def _result(strategy, allocations, skipped_orders, shipment_ids):
+    logger.info(f"Allocation ({strategy.name}): {len(allocations)} shipments planned, {len(skipped_orders)} orders skipped")
 
-                    continue
+    partial_order_ids = {skipped["order_id"] for skipped in skipped_orders if skipped["reason"] == PARTIALLY_ALLOCATED}
+    allocated_orders = [
+        {
+            "order_id": allocation.order_id,
+            "shipment_id": shipment_id,
+            "employee_id": allocation.employee_id,
+            "quantity": allocation.quantity,
+            "status": "partially_allocated" if allocation.order_id in partial_order_ids else "allocated",
+        }
+        for allocation, shipment_id in zip(allocations, shipment_ids)
+    ]
+    return {"strategy": strategy.name, "allocated_orders": allocated_orders, "skipped_orders": skipped_orders}
 
-                # Find an employee with a truck that has enough capacity
-                employee = next(
-                    (emp for emp in available_employees if truck_capacity_map.get(emp.truck.truck_id, 0) >= order.required_qty),
-                    None
-                )
 
-                if not employee:
-                    skipped_orders.append({"order_id": order.order_id, "reason": "No suitable truck available"})
-                    continue
+def _allocate(pending_orders, stock, trucks, strategy):
+    """Plans and commits an allocation over already loaded orders and trucks."""
+    allocations, skipped_orders = strategy.plan(pending_orders, trucks, stock)
+    shipment_ids = _commit(pending_orders, allocations, skipped_orders)
+    return _result(strategy, allocations, skipped_orders, shipment_ids)
 
-                truck = employee.truck  
 
-                # Create a new shipment
-                shipment = Shipment.objects.create(
-                    order=order,
-                    employee=employee,
-                    status='in_transit'
-                )
+def _claim_trucks(pending_orders, carried_trucks):
+    """
+    Claims free trucks for a chunk, one per order at a time, until they can carry
+    what the chunk still needs beyond the carried trucks' room (or none are left),
+    so concurrent runs still find trucks to claim.
+    """
+    needed = sum(order.required_qty for order in pending_orders) - sum(truck.capacity for truck in carried_trucks.values())
+    claimed = []
+    while needed > 0:
+        claimable = Employee.objects.exclude(employee_id__in=[*carried_trucks, *(truck.employee_id for truck in claimed)])
+        batch = load_available_trucks(claimable, lock=True, limit=len(pending_orders))
+        claimed.extend(batch)
+        needed -= sum(truck.capacity for truck in batch)
+        if len(batch) < len(pending_orders):
+            break
+    return claimed
+
+
+def _claim_chunk(strategy, carried_trucks, after, chunk_size):
+    """
+    Claims and allocates one chunk of the backlog in its own transaction.
+
+    Returns (pending_orders, allocations, skipped_orders, shipment_ids, trucks).
+    """
+    orders = Order.objects.all()
+    if after is not None:
+        order_date, order_id = after
+        orders = orders.filter(Q(order_date__gt=order_date) | Q(order_date=order_date, order_id__gt=order_id))
+
+    with transaction.atomic():
+        pending_orders, stock = load_pending_orders(orders, lock=True, limit=chunk_size)
+        if not pending_orders:
+            return [], [], [], [], []
+
+        trucks = list(carried_trucks.values()) + _claim_trucks(pending_orders, carried_trucks)
+        allocations, skipped_orders = strategy.plan(pending_orders, trucks, stock)
+        shipment_ids = _commit(pending_orders, allocations, skipped_orders)
+        return pending_orders, allocations, skipped_orders, shipment_ids, trucks
+
+
+def run_allocation(strategy=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Allocate shipments dynamically based on truck capacity and product stock.
+
+    This is the full pass over the pending backlog, used on demand and for
+    reconciliation after incremental allocation. The backlog is walked oldest
+    first in chunks of ``chunk_size`` orders, each in its own transaction:
+
+    - pending orders and free trucks are claimed with FOR UPDATE SKIP LOCKED,
+      so concurrent runs (see the allocate_backlog command) work on disjoint
+      slices instead of double-booking trucks; a chunk only claims the free
+      trucks it needs to carry its orders, leaving the rest to the other runs,
+    - the chunk is planned in memory and written by commit_plan, whose guarded
+      stock decrement raises StockConflict if another run sold the stock first;
+      the chunk is then rolled back and planned again on fresh data.
+
+    Trucks loaded in an earlier chunk keep their remaining room for later chunks
+    of the same run. The run stops once a chunk finds no truck left to claim;
+    its orders are reported as skipped. ``progress`` is called with
+    (orders_seen, shipments_planned, orders_skipped) after each committed chunk.
+    Returns a dict with the allocated and skipped orders. Raises ValueError for an
+    unknown strategy and AllocationError when stock keeps changing under it.
+    """
+    strategy = get_strategy(strategy)
+    allocations = []
+    skipped_orders = []
+    shipment_ids = []
+    carried_trucks = {}
+    orders_seen = 0
+    after = None
 
-                # Log product details before update
-                logger.info(f"Before update: Product {product.name} - Available: {product.available_quantity}, Required: {product.total_required_quantity}, Status: {product.status}")
+    while True:
+        for attempt in range(1, STOCK_CONFLICT_RETRIES + 1):
+            try:
+                chunk = _claim_chunk(strategy, carried_trucks, after, chunk_size)
+                break
+            except StockConflict as e:
+                logger.warning(f"Allocation chunk after {after}: {e} (attempt {attempt})")
+        else:
+            raise AllocationError("Stock kept changing during allocation, try again")
 
-                # Reduce available quantity
-                Product.objects.filter(product_id=product.product_id).update(
-                    available_quantity=F('available_quantity') - order.required_qty
-                )
+        chunk_orders, chunk_allocations, chunk_skipped, chunk_shipment_ids, trucks = chunk
+        if not chunk_orders:
+            break
 
-                # Refresh and update status
-                product.refresh_from_db()
-                product.update_status()
-                product.save(update_fields=['status'])
+        allocations.extend(chunk_allocations)
+        skipped_orders.extend(chunk_skipped)
+        shipment_ids.extend(chunk_shipment_ids)
+        orders_seen += len(chunk_orders)
+        after = (chunk_orders[-1].order_date, chunk_orders[-1].order_id)
 
-                # Log product details after update
-                logger.info(f"After update: Product {product.name} - Available: {product.available_quantity}, Required: {product.total_required_quantity}, Status: {product.status}")
+        # Trucks loaded in this chunk are now in transit; keep their room in memory
+        used = {}
+        for allocation in chunk_allocations:
+            used[allocation.employee_id] = used.get(allocation.employee_id, 0) + allocation.quantity
+        for truck in trucks:
+            room = truck.capacity - used.get(truck.employee_id, 0)
+            if truck.employee_id in used or truck.employee_id in carried_trucks:
+                if room > 0:
+                    carried_trucks[truck.employee_id] = truck._replace(capacity=room)
+                else:
+                    carried_trucks.pop(truck.employee_id, None)
 
-                # Update truck capacity
-                truck_capacity_map[truck.truck_id] -= order.required_qty
+        if progress:
+            progress(orders_seen, len(allocations), len(skipped_orders))
 
-                # Mark order as allocated
-                order.status = 'allocated'
-                order.save()
+        # No free truck left (or all claimed by concurrent runs): nothing more to place
+        if len(chunk_orders) < chunk_size or not trucks:
+            break
 
-                allocated_orders.append({
-                    "order_id": order.order_id,
-                    "shipment_id": shipment.shipment_id,
-                    "status": "allocated"
-                })
+    return _result(strategy, allocations, skipped_orders, shipment_ids)
+
+
+# ===================== INCREMENTAL ALLOCATION =====================
+
+def schedule_incremental_allocation(allocate, *args):
+    """Runs an incremental allocation once the current transaction has committed."""
+    if not getattr(settings, "INCREMENTAL_ALLOCATION", False):
+        return
+
+    def run():
+        try:
+            allocate(*args)
+        except Exception:
+            logger.exception("Incremental allocation failed")
+
+    transaction.on_commit(run)
+
+
+def allocate_order(order_id, strategy=None):
+    """
+    Places one newly created order against the trucks that are free right now.
+
+    Only that order is read, never the rest of the backlog, and only the free
+    trucks it needs are claimed (see _claim_trucks), leaving the rest of the
+    fleet to concurrent passes.
+    """
+    strategy = get_strategy(strategy)
+
+    with transaction.atomic():
+        pending_orders, stock = load_pending_orders(Order.objects.filter(order_id=order_id), lock=True)
+        trucks = _claim_trucks(pending_orders, {}) if pending_orders else []
+        return _allocate(pending_orders, stock, trucks, strategy)
+
+
+def allocate_for_truck(employee_id, strategy=None):
+    """
+    Loads a newly freed truck from the pending orders it can actually serve.
+
+    Orders short of stock are filtered out in SQL, so orders that would be
+    skipped for the same reason again are never read. Orders larger than the
+    truck are kept: the strategy splits them, loading what fits.
+    Only the oldest orders the truck could carry are claimed (each order needs
+    at least one unit of room), so concurrent passes keep the rest of the
+    backlog.
+    """
+    strategy = get_strategy(strategy)
+
+    with transaction.atomic():
+        trucks = load_available_trucks(Employee.objects.filter(employee_id=employee_id), lock=True)
+        if not trucks:
+            return _allocate([], {}, [], strategy)
+
+        pending_orders, stock = load_pending_orders(
+            Order.objects.filter(product__available_quantity__gte=F('required_qty') - F('allocated_qty')),
+            lock=True, limit=min(trucks[0].capacity, DEFAULT_CHUNK_SIZE),
+        )
+        return _allocate(pending_orders, stock, trucks, strategy)
+
+
+# ===================== SIMULATION =====================
+
+class AllocationSnapshot:
+    """
+    Pending orders, stock and the whole fleet, read once for what-if planning.
+
+    ``simulate`` can be called any number of times on the same snapshot; every
+    call plans on its own copy of the data and never writes to the database.
+    """
+
+    def __init__(self):
+        started = time.perf_counter()
+        self.pending_orders, self.stock = load_pending_orders()
+        self.reorder_points = reorder_points(self.stock)
+
+        rows = (
+            Employee.objects.filter(truck__isnull=False)
+            .values_list('employee_id', 'truck__truck_id', 'truck__capacity', 'truck__in_transit_count')
+            .order_by('employee_id')
+        )
+        self.free_trucks = []
+        self.busy_trucks = {}
+        for employee_id, truck_id, capacity, in_transit_count in rows:
+            truck = TruckSlot(employee_id, truck_id, capacity)
+            if in_transit_count:
+                self.busy_trucks[employee_id] = truck
+            else:
+                self.free_trucks.append(truck)
+
+        self.load_ms = (time.perf_counter() - started) * 1000
+
+    def simulate(self, strategy=None, extra_trucks=(), returned_employees=(), restock=None):
+        """
+        Plans an allocation with overrides applied:
+
+        - ``extra_trucks``: capacities of hypothetical extra trucks, planned with
+          negative employee ids and "extra-<n>" truck ids,
+        - ``returned_employees``: employee ids whose trucks count as back and free,
+        - ``restock``: product_id -> quantity added to the current stock.
+
+        The result also lists the products the plan would take below their
+        forecast reorder point (see app/forecasting.py).
+        """
+        strategy = get_strategy(strategy)
+        started = time.perf_counter()
+
+        trucks = list(self.free_trucks)
+        for employee_id in returned_employees:
+            if employee_id in self.busy_trucks:
+                trucks.append(self.busy_trucks[employee_id])
+        for index, capacity in enumerate(extra_trucks, start=1):
+            trucks.append(TruckSlot(-index, f"extra-{index}", capacity))
+
+        stock = dict(self.stock)
+        for product_id, quantity in (restock or {}).items():
+            if product_id in stock:
+                stock[product_id] += quantity
+
+        allocations, skipped_orders = strategy.plan(self.pending_orders, trucks, stock)
+        truck_of = {truck.employee_id: truck.truck_id for truck in trucks}
+
+        return {
+            "strategy": strategy.name,
+            "allocated_orders": [
+                {
+                    "order_id": allocation.order_id,
+                    "employee_id": allocation.employee_id,
+                    "truck_id": truck_of[allocation.employee_id],
+                    "quantity": allocation.quantity,
+                }
+                for allocation in allocations
+            ],
+            "skipped_orders": skipped_orders,
+            # Products the plan would take below their forecast reorder point
+            "reorder": [
+                {"product_id": product_id, "stock_after": stock[product_id], "reorder_point": point}
+                for product_id, point in sorted(self.reorder_points.items())
+                if stock[product_id] < point
+            ],
+            "summary": {
+                "allocated": len(allocations),
+                "skipped": len(skipped_orders),
+                "allocated_quantity": sum(allocation.quantity for allocation in allocations),
+                "trucks_available": len(trucks),
+                "trucks_used": len({allocation.employee_id for allocation in allocations}),
+            },
+            "timing_ms": {
+                "snapshot": round(self.load_ms, 2),
+                "plan": round((time.perf_counter() - started) * 1000, 2),
+            },
+        }
+
+
+def allocate_shipments(request):
+    """
+    Allocate pending orders to available trucks.
+
+    The strategy can be chosen with a "strategy" field in the request body
+    (see STRATEGIES); it defaults to DEFAULT_STRATEGY. "chunk_size" overrides
+    how many orders are claimed per transaction.
+    """
+    try:
+        chunk_size = get_chunk_size(request.data.get("chunk_size"))
+        result = run_allocation(request.data.get("strategy"), chunk_size=chunk_size)
+        return Response(result)
 
-        return Response({"allocated_orders": allocated_orders, "skipped_orders": skipped_orders})
+    except (AllocationError, ValueError) as e:
+        return Response({"error": str(e)}, status=400)
 
     except Exception as e:
         logger.error(f"Error: {str(e)}")
-        return Response({"error": str(e)}, status=500)
\ No newline at end of file
+        return Response({"error": str(e)}, status=500)
@@ -0,0 +1,152 @@
+import functools
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from .models import ResourceVersion
+
+# Cached dashboard responses are keyed on the versions of the data they read,
+# kept in the ResourceVersion table. A write bumps the version of what it
+# touched, after commit, so the next poll misses and recomputes; every other
+# poll is answered from the cache. The same versions are the ETags of
+# conditional GETs (see conditional_response).
+ORDERS = "orders"
+SHIPMENTS = "shipments"
+PRODUCTS = "products"
+CATEGORIES = "categories"
+EMPLOYEES = "employees"
+RETAILERS = "retailers"
+TRUCKS = "trucks"
+ADMIN_LOG = "admin_log"
+
+
+def _cache():
+    return caches[getattr(settings, "DASHBOARD_CACHE_ALIAS", "default")]
+
+
+def resource_versions(*resources, request=None):
+    """
+    {resource: (version, updated_at)} read from the ResourceVersion table in one
+    primary-key query, so every process sees the same versions. With
+    ``request`` the values are kept on it, so the decorators of one view read
+    them once. A resource that never changed has version 0 and no updated_at.
+    """
+    known = getattr(request, "_resource_versions", {}) if request is not None else {}
+    missing = [resource for resource in resources if resource not in known]
+    if missing:
+        rows = ResourceVersion.objects.filter(resource__in=missing).values_list("resource", "version", "updated_at")
+        found = {resource: (version, updated_at) for resource, version, updated_at in rows}
+        known = {**known, **{resource: found.get(resource, (0, None)) for resource in missing}}
+        if request is not None:
+            request._resource_versions = known
+    return {resource: known[resource] for resource in resources}
+
+
+def versions(*resources, request=None):
+    """Current version of each resource."""
+    current = resource_versions(*resources, request=request)
+    return tuple(current[resource][0] for resource in resources)
+
+
+def last_modified(*resources, request=None):
+    """When any of ``resources`` last changed; a resource with no recorded change counts as changed now."""
+    current = resource_versions(*resources, request=request)
+    return max(updated_at or timezone.now() for _, updated_at in current.values())
+
+
+def _bump(resources):
+    now = timezone.now()
+    resources = set(resources)
+    updated = ResourceVersion.objects.filter(resource__in=resources).update(version=F("version") + 1, updated_at=now)
+    if updated < len(resources):
+        ResourceVersion.objects.bulk_create(
+            [ResourceVersion(resource=resource, version=1, updated_at=now) for resource in resources],
+            ignore_conflicts=True,
+        )
+
+
+def bump(*resources):
+    """
+    Invalidates the cached responses that read ``resources``, once the current
+    transaction commits (immediately outside one), so a poll in between cannot
+    cache data that is about to change. The new versions are written to the
+    database, so the other server processes and the management commands see
+    them on their next request.
+    """
+    transaction.on_commit(lambda: _bump(resources))
+
+
+def cached_response(*resources, timeout=None):
+    """
+    Caches a function view's successful responses until one of ``resources``
+    changes. Goes under @api_view / @permission_classes, so authentication and
+    permissions still run on every request. Entries are keyed on the database
+    versions, so even a per-process cache never serves data another process
+    has changed. A hit costs one primary-key read of the versions and one
+    cache read.
+    """
+
+    def decorator(view):
+        name = f"{view.__module__}.{view.__name__}"
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "GET":
+                return view(request, *args, **kwargs)
+
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            key = f"response:{name}:{path}:{':'.join(map(str, versions(*resources, request=request)))}"
+            cache = _cache()
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(key, response.data, timeout or getattr(settings, "DASHBOARD_CACHE_TIMEOUT", 600))
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def conditional_response(*resources):
+    """
+    Adds ETag and Last-Modified to a function view's successful responses and
+    answers If-None-Match / If-Modified-Since with 304 Not Modified while none
+    of ``resources`` has changed, before the view runs a query or serialises
+    anything. The validators come from the database versions (see
+    resource_versions), so a change made by any process invalidates them; the
+    ETag covers the full path, so each page and filter has its own. Error
+    responses carry no validators, so they are never revalidated into a 304.
+    Goes under @api_view / @permission_classes like cached_response.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+
+            stamp = f"{request.get_full_path()}:{':'.join(map(str, versions(*resources, request=request)))}"
+            etag = quote_etag(hashlib.md5(stamp.encode()).hexdigest())
+            modified = int(last_modified(*resources, request=request).timestamp())
+
+            response = get_conditional_response(request, etag=etag, last_modified=modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if 200 <= response.status_code < 300 or response.status_code == status.HTTP_304_NOT_MODIFIED:
+                response.headers.setdefault("ETag", etag)
+                response.headers.setdefault("Last-Modified", http_date(modified))
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,67 @@
+from collections import namedtuple
+from django.db import connection
+from django.db.models import Count, Q, Value
+from .models import Employee, Order, Product, Retailer, Shipment, Truck
+
+# A dashboard figure: an aggregate expression over one model's table
+KPI = namedtuple("KPI", ["model", "expression"])
+
+KPIS = {}
+
+
+def register_kpi(name, model, expression):
+    """
+    Adds a figure to dashboard_stats. KPIs over the same model share one
+    conditional aggregation (one scan of that table), so registering more of
+    them adds columns to the statement, not queries.
+    """
+    KPIS[name] = KPI(model, expression)
+
+
+register_kpi("orders_placed", Order, Count("pk"))
+for order_status, _ in Order.STATUS_CHOICES:
+    register_kpi(f"orders_{order_status}", Order, Count("pk", filter=Q(status=order_status)))
+register_kpi("shipments_in_transit", Shipment, Count("pk", filter=Q(status="in_transit")))
+register_kpi("products_on_demand", Product, Count("pk", filter=Q(status="on_demand")))
+register_kpi("idle_trucks", Truck, Count("pk", filter=Q(in_transit_count=0)))
+register_kpi("employees_available", Employee, Count("pk"))
+register_kpi("retailers_available", Retailer, Count("pk"))
+
+
+def dashboard_stats(names=None):
+    """
+    Returns {name: value} for the given KPIs (default: all registered) in one
+    round trip: one single-row aggregate per table, cross joined.
+    """
+    names = list(names or KPIS)
+    unknown = [name for name in names if name not in KPIS]
+    if unknown:
+        raise ValueError(f"Unknown KPI(s): {', '.join(unknown)}")
+
+    by_model = {}
+    for name in names:
+        by_model.setdefault(KPIS[name].model, []).append(name)
+
+    quote = connection.ops.quote_name
+    columns, tables, params = [], [], []
+    for index, (model, model_kpis) in enumerate(by_model.items()):
+        # Grouping on a constant leaves no GROUP BY: exactly one row, even for an empty table
+        aggregate = (
+            model.objects.order_by()
+            .annotate(_all=Value(1)).values("_all")
+            .annotate(**{name: KPIS[name].expression for name in model_kpis})
+            .values(*model_kpis)
+        )
+        sql, sql_params = aggregate.query.sql_with_params()
+        alias = quote(f"kpi_{index}")
+        tables.append(f"({sql}) {alias}")
+        params.extend(sql_params)
+        columns.extend(f"{alias}.{quote(name)}" for name in model_kpis)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT {', '.join(columns)} FROM {' CROSS JOIN '.join(tables)}", params)
+        row = cursor.fetchone()
+
+    ordered = [name for model_kpis in by_model.values() for name in model_kpis]
+    values = dict(zip(ordered, row))
+    return {name: values[name] for name in names}
@@ -0,0 +1,119 @@
+from collections import namedtuple
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from .allocation import adjust_truck_loads, allocate_for_truck, schedule_incremental_allocation
+from .cache import bump, ORDERS, SHIPMENTS
+from .models import Employee, Order, Shipment
+from .stock import adjust_quantities, batches
+
+SHIPMENT_STATUSES = [choice for choice, _ in Shipment.STATUS_CHOICES]
+
+# A shipment status change that has been written, with what its side effects need
+Transition = namedtuple("Transition", ["shipment_id", "order_id", "product_id", "employee_id", "quantity", "old_status", "new_status"])
+
+
+class DeliveryError(Exception):
+    """Raised when a batch of status updates cannot be applied; nothing is written."""
+
+
+def apply_transitions(transitions):
+    """
+    Applies the side effects of shipment status changes already written to the
+    database, in bulk and with a fixed number of statements:
+
+    - one counter UPDATE per batch of products: a delivered shipment moves its
+      quantity from total_required_quantity to total_shipped (and back if a
+      delivery is undone), recorded in the stock ledger as 'delivery',
+    - one UPDATE marking orders delivered once all of their quantity is
+      allocated and every shipment is delivered, one reopening orders whose
+      delivery was undone,
+    - the in-transit counters of the trucks involved (see adjust_truck_loads),
+      which also free trucks with nothing left in transit, plus one read of
+      the freed trucks, which are loaded from the backlog after commit.
+
+    Every path that changes a shipment's status ends up here, so delivery
+    bookkeeping is done exactly once.
+    """
+    transitions = [t for t in transitions if t.old_status != t.new_status]
+    if not transitions:
+        return
+
+    delivered = [t for t in transitions if t.new_status == 'delivered']
+    undone = [t for t in transitions if t.old_status == 'delivered']
+
+    # Product counters, one aggregated delta per product
+    changes = {}
+    for t, sign in [(t, 1) for t in delivered] + [(t, -1) for t in undone]:
+        deltas = changes.setdefault(t.product_id, {"total_required_quantity": 0, "total_shipped": 0})
+        deltas["total_required_quantity"] -= sign * t.quantity
+        deltas["total_shipped"] += sign * t.quantity
+    if changes:
+        adjust_quantities(changes, kind="delivery", reference=f"shipments {','.join(str(t.shipment_id) for t in transitions[:5])}")
+
+    # Orders, without going through Order.save (the counters are already right)
+    open_shipments = Shipment.objects.filter(order=OuterRef('pk')).exclude(status='delivered')
+    for order_ids in batches({t.order_id for t in delivered}):
+        (Order.objects.filter(order_id__in=order_ids, allocated_qty__gte=F('required_qty'), status='allocated')
+         .exclude(Exists(open_shipments))
+         .update(status='delivered'))
+    for order_ids in batches({t.order_id for t in undone}):
+        Order.objects.filter(order_id__in=order_ids, status='delivered').update(status='allocated')
+    bump(ORDERS, SHIPMENTS)
+
+    # Trucks: shipments leaving 'in_transit' unload them, shipments entering it load them
+    loads = {}
+    for t in transitions:
+        sign = (t.new_status == 'in_transit') - (t.old_status == 'in_transit')
+        count, quantity = loads.get(t.employee_id, (0, 0))
+        loads[t.employee_id] = (count + sign, quantity + sign * t.quantity)
+    adjust_truck_loads(loads)
+
+    freed = Employee.objects.filter(
+        employee_id__in={t.employee_id for t in delivered}, truck__in_transit_count=0,
+    ).values_list('employee_id', flat=True)
+    for employee_id in freed:
+        # Load the freed truck from the pending backlog
+        schedule_incremental_allocation(allocate_for_truck, employee_id)
+
+
+def update_shipment_statuses(updates, employee=None):
+    """
+    Sets the status of many shipments in one transaction, all or nothing.
+
+    ``updates`` maps shipment_id -> new status. With ``employee`` only that
+    employee's shipments may be updated. A delivered shipment cannot change
+    status again. Costs one locking read, one UPDATE per distinct new status
+    and the fixed set of statements of apply_transitions. Returns the number of
+    shipments whose status changed.
+    """
+    invalid = sorted({new_status for new_status in updates.values() if new_status not in SHIPMENT_STATUSES})
+    if invalid:
+        raise DeliveryError(f"Invalid status: {', '.join(map(str, invalid))}")
+
+    with transaction.atomic():
+        shipments = Shipment.objects.select_for_update(of=('self',)).filter(shipment_id__in=updates)
+        if employee is not None:
+            shipments = shipments.filter(employee=employee)
+        rows = shipments.values_list('shipment_id', 'order_id', 'order__product_id', 'employee_id', 'quantity', 'status')
+
+        transitions = [
+            Transition(shipment_id, order_id, product_id, employee_id, quantity, old_status, updates[shipment_id])
+            for shipment_id, order_id, product_id, employee_id, quantity, old_status in rows
+        ]
+        missing = set(updates) - {t.shipment_id for t in transitions}
+        if missing:
+            raise DeliveryError(f"Shipment(s) not found or unauthorized: {', '.join(map(str, sorted(missing)))}")
+
+        reopened = [t.shipment_id for t in transitions if t.old_status == 'delivered' and t.new_status != 'delivered']
+        if reopened:
+            raise DeliveryError(f"Shipment(s) already delivered: {', '.join(map(str, sorted(reopened)))}")
+
+        transitions = [t for t in transitions if t.old_status != t.new_status]
+        for new_status in {t.new_status for t in transitions}:
+            shipment_ids = [t.shipment_id for t in transitions if t.new_status == new_status]
+            for batch in batches(shipment_ids):
+                Shipment.objects.filter(shipment_id__in=batch).update(status=new_status)
+
+        apply_transitions(transitions)
+
+    return len(transitions)
@@ -0,0 +1,43 @@
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from .models import Employee, Truck
+
+EMPLOYEE_GROUP = "employee"
+
+
+def is_employee_group(group_ids):
+    """True if one of ``group_ids`` is the employee group (its name is matched case-insensitively)."""
+    return Group.objects.filter(pk__in=group_ids, name__iexact=EMPLOYEE_GROUP).exists()
+
+
+def provision_employee(user):
+    """
+    Makes sure ``user`` has an Employee profile with a truck, assigning one no
+    other employee drives if there is any. Safe to call repeatedly; returns the
+    Employee.
+    """
+    with transaction.atomic():
+        employee, _ = Employee.objects.get_or_create(user=user)
+        if employee.truck_id is None:
+            # SKIP LOCKED, so concurrent provisioning never hands out the same truck;
+            # NOT EXISTS rather than a reverse join, which Postgres cannot lock FOR UPDATE
+            truck = (
+                Truck.objects.select_for_update(skip_locked=True)
+                .filter(~Exists(Employee.objects.filter(truck=OuterRef('pk'))))
+                .order_by('truck_id')
+                .first()
+            )
+            if truck:
+                employee.truck = truck
+                employee.save(update_fields=['truck'])
+    return employee
+
+
+def provision_employees(users):
+    """Provisions every user in ``users``; returns the number provisioned."""
+    count = 0
+    for user in users:
+        provision_employee(user)
+        count += 1
+    return count
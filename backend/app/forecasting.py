@@ -0,0 +1,117 @@
+from datetime import datetime, time, timedelta
+from statistics import NormalDist
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Order, ProductForecast
+from .stock import batches
+
+DEFAULT_HISTORY_DAYS = 90
+DEFAULT_ALPHA = 0.3
+DEFAULT_LEAD_TIME_DAYS = 7
+DEFAULT_SERVICE_LEVEL = 0.95
+
+
+def load_daily_demand(history_days=DEFAULT_HISTORY_DAYS, today=None):
+    """
+    Returns (product_ids, demand): the products ordered in the last
+    ``history_days`` days and a (products x days) matrix of units ordered per
+    day, oldest day first. One aggregated query, scattered into NumPy.
+    """
+    today = today or timezone.localdate()
+    start = today - timedelta(days=history_days - 1)
+    window_start = timezone.make_aware(datetime.combine(start, time.min))
+    window_end = timezone.make_aware(datetime.combine(today + timedelta(days=1), time.min))
+
+    rows = list(
+        Order.objects.filter(order_date__gte=window_start, order_date__lt=window_end)
+        .exclude(status='cancelled')
+        .annotate(day=TruncDate('order_date'))
+        .values('product_id', 'day')
+        .annotate(quantity=Sum('required_qty'))
+        .values_list('product_id', 'day', 'quantity')
+        .order_by()
+    )
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.zeros((0, history_days))
+
+    product_column, day_column, quantity_column = zip(*rows)
+    product_ids, product_index = np.unique(np.array(product_column, dtype=np.int64), return_inverse=True)
+    day_index = (np.array(day_column, dtype='datetime64[D]') - np.datetime64(start, 'D')).astype(np.int64)
+
+    demand = np.zeros((len(product_ids), history_days))
+    np.add.at(demand, (product_index, day_index), np.array(quantity_column, dtype=np.float64))
+    return product_ids, demand
+
+
+def forecast(demand, alpha=DEFAULT_ALPHA, lead_time_days=DEFAULT_LEAD_TIME_DAYS, service_level=DEFAULT_SERVICE_LEVEL):
+    """
+    Simple exponential smoothing and reorder points for every row of ``demand`` at once.
+
+    The smoothed level after the last day is a weighted sum of the history
+    (weights alpha * (1 - alpha)^age, the remainder on the window mean as the
+    starting level), so all products are one matrix-vector product. The reorder
+    point covers the forecast demand over the lead time plus a safety stock of
+    z * std * sqrt(lead time) for the requested service level.
+    Returns (daily_demand, demand_std, safety_stock, reorder_point) arrays.
+    """
+    days = demand.shape[1]
+    ages = np.arange(days - 1, -1, -1)
+    weights = alpha * (1 - alpha) ** ages
+
+    mean = demand.mean(axis=1)
+    daily_demand = demand @ weights + (1 - alpha) ** days * mean
+    demand_std = demand.std(axis=1)
+
+    z = NormalDist().inv_cdf(service_level)
+    safety_stock = np.ceil(z * demand_std * np.sqrt(lead_time_days))
+    reorder_point = np.ceil(daily_demand * lead_time_days) + safety_stock
+    return daily_demand, demand_std, safety_stock.astype(np.int64), reorder_point.astype(np.int64)
+
+
+def update_forecasts(history_days=DEFAULT_HISTORY_DAYS, alpha=DEFAULT_ALPHA,
+                     lead_time_days=DEFAULT_LEAD_TIME_DAYS, service_level=DEFAULT_SERVICE_LEVEL):
+    """
+    Recomputes ProductForecast for every product ordered in the history window
+    (one read, NumPy, then batched upserts); forecasts of products no longer
+    ordered are removed. Returns the number of products forecast.
+    """
+    product_ids, demand = load_daily_demand(history_days)
+    daily_demand, demand_std, safety_stock, reorder_point = forecast(demand, alpha, lead_time_days, service_level)
+
+    with transaction.atomic():
+        return _store_forecasts(product_ids, daily_demand, demand_std, safety_stock, reorder_point, lead_time_days, history_days)
+
+
+def _store_forecasts(product_ids, daily_demand, demand_std, safety_stock, reorder_point, lead_time_days, history_days):
+    computed_at = timezone.now()
+    forecasts = [
+        ProductForecast(
+            product_id=product_id, daily_demand=round(daily, 4), demand_std=round(std, 4),
+            safety_stock=safety, reorder_point=reorder, lead_time_days=lead_time_days,
+            history_days=history_days, computed_at=computed_at,
+        )
+        for product_id, daily, std, safety, reorder in zip(
+            product_ids.tolist(), daily_demand.tolist(), demand_std.tolist(), safety_stock.tolist(), reorder_point.tolist()
+        )
+    ]
+    for batch in batches(forecasts):
+        ProductForecast.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=["product"],
+            update_fields=["daily_demand", "demand_std", "safety_stock", "reorder_point",
+                           "lead_time_days", "history_days", "computed_at"],
+        )
+    ProductForecast.objects.filter(computed_at__lt=computed_at).delete()
+    return len(forecasts)
+
+
+def reorder_points(product_ids):
+    """Returns {product_id: reorder_point} for the given products that have a forecast."""
+    points = {}
+    for batch in batches(set(product_ids)):
+        points.update(ProductForecast.objects.filter(product_id__in=batch).values_list('product_id', 'reorder_point'))
+    return points
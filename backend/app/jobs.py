@@ -0,0 +1,97 @@
+import logging
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .allocation import run_allocation, get_chunk_size, get_strategy, AllocationError, DEFAULT_CHUNK_SIZE
+from .models import AllocationJob
+
+logger = logging.getLogger(__name__)
+
+
+def submit_allocation_job(strategy=None, chunk_size=None, user=None):
+    """
+    Queues a full allocation pass, or returns the job that is already queued or
+    running. Returns (job, created). Raises ValueError for an unknown strategy
+    or a chunk size below 1.
+    """
+    # Reject unknown strategies and invalid chunk sizes up front
+    strategy = get_strategy(strategy).name
+    if chunk_size is not None:
+        chunk_size = get_chunk_size(chunk_size)
+
+    active = AllocationJob.objects.filter(status__in=AllocationJob.ACTIVE_STATUSES).first()
+    if active:
+        return active, False
+
+    try:
+        with transaction.atomic():
+            job = AllocationJob.objects.create(strategy=strategy, chunk_size=chunk_size, requested_by=user)
+        return job, True
+    except IntegrityError:
+        # Another request queued one in the meantime (one_active_allocation_job_per_kind);
+        # any other violation is a real error
+        active = AllocationJob.objects.filter(status__in=AllocationJob.ACTIVE_STATUSES).first()
+        if active is None:
+            raise
+        return active, False
+
+
+def claim_next_job():
+    """Marks the oldest queued job as running and returns it, or None if there is none."""
+    with transaction.atomic():
+        job = (
+            AllocationJob.objects.select_for_update(skip_locked=True)
+            .filter(status='queued')
+            .order_by('created_at')
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = 'running'
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at', 'updated_at'])
+        return job
+
+
+def fail_stale_jobs(stale_after):
+    """Fails running jobs whose worker has not reported progress for ``stale_after`` seconds."""
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    return AllocationJob.objects.filter(status='running', updated_at__lt=cutoff).update(
+        status='failed', error="Worker stopped reporting progress", finished_at=timezone.now()
+    )
+
+
+def run_job(job):
+    """
+    Runs a claimed job, recording progress after every chunk and the final result.
+    A failed job keeps the progress recorded by the chunks committed before it failed.
+    """
+    def progress(orders_seen, shipments_planned, orders_skipped):
+        AllocationJob.objects.filter(job_id=job.job_id).update(
+            orders_processed=orders_seen,
+            shipments_created=shipments_planned,
+            orders_skipped=orders_skipped,
+            updated_at=timezone.now(),
+        )
+
+    fields = ['status', 'error', 'finished_at', 'updated_at']
+    try:
+        result = run_allocation(job.strategy or None, chunk_size=job.chunk_size or DEFAULT_CHUNK_SIZE, progress=progress)
+    except AllocationError as e:
+        job.status, job.error = 'failed', str(e)
+    except Exception as e:
+        logger.exception(f"Allocation job {job.job_id} failed")
+        job.status, job.error = 'failed', str(e)
+    else:
+        job.status, job.result = 'succeeded', result
+        job.shipments_created = len(result["allocated_orders"])
+        job.orders_skipped = len(result["skipped_orders"])
+        fields += ['result', 'shipments_created', 'orders_skipped']
+
+    if job.status == 'failed':
+        # Keep the progress of the chunks committed before the failure
+        job.refresh_from_db(fields=['orders_processed', 'shipments_created', 'orders_skipped'])
+    job.finished_at = timezone.now()
+    job.save(update_fields=fields)
+    return job
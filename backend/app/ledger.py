@@ -0,0 +1,129 @@
+from datetime import timedelta
+from django.db import connection, transaction
+from django.db.models import Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Product, StockMovement, StockSnapshot
+from .stock import MOVEMENT_FIELDS, batches
+
+
+def _with_levels(products, snapshots, movements):
+    """
+    Annotates ``products`` with ledger_<counter> values: the latest of
+    ``snapshots`` plus the sum of ``movements`` recorded after it. Everything
+    is a correlated subquery, so any number of products costs one query.
+    """
+    snapshot = snapshots.filter(product=OuterRef("pk")).order_by("-last_movement_id")
+    products = products.annotate(
+        ledger_from=Coalesce(Subquery(snapshot.values("last_movement_id")[:1]), 0),
+    )
+
+    annotations = {}
+    for field, delta in MOVEMENT_FIELDS.items():
+        moved = (
+            movements.filter(product=OuterRef("pk"), movement_id__gt=OuterRef("ledger_from"))
+            .order_by().values("product").annotate(total=Sum(delta)).values("total")
+        )
+        annotations[f"ledger_{field}"] = (
+            Coalesce(Subquery(snapshot.values(field)[:1]), 0) + Coalesce(Subquery(moved), 0)
+        )
+    return products.annotate(**annotations)
+
+
+def _levels(rows):
+    return {
+        row["product_id"]: {field: row[f"ledger_{field}"] for field in MOVEMENT_FIELDS}
+        for row in rows
+    }
+
+
+def stock_at(at, product_ids=None):
+    """
+    Returns {product_id: {counter: value}} as the ledger stood at ``at``.
+
+    Each product reads its latest snapshot taken at or before ``at`` plus the
+    movements recorded between that snapshot and ``at``, so the cost depends
+    on how often the ledger is compacted, not on the length of its history.
+    """
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(product_id__in=product_ids)
+
+    rows = _with_levels(
+        products,
+        StockSnapshot.objects.filter(taken_at__lte=at),
+        StockMovement.objects.filter(created_at__lte=at),
+    ).values("product_id", *[f"ledger_{field}" for field in MOVEMENT_FIELDS])
+    return _levels(rows)
+
+
+def settled_movement_id():
+    """
+    Returns the highest movement id below which no transaction can still
+    commit a movement, or None while the ledger is empty.
+
+    Ids are handed out when a movement is inserted, not when it commits, so a
+    long transaction can commit an id lower than ones already visible. On
+    PostgreSQL a SHARE lock on the ledger waits for every transaction that has
+    inserted into it to finish (and holds back new inserts only until this
+    short transaction commits); any movement inserted afterwards gets a higher
+    id. Other backends serialize writes, so the committed maximum is settled.
+    """
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(f"LOCK TABLE {connection.ops.quote_name(StockMovement._meta.db_table)} IN SHARE MODE")
+        return StockMovement.objects.aggregate(last=Max("movement_id"))["last"]
+
+
+def compact(settle_seconds=60):
+    """
+    Folds the movements recorded since the last compaction into one new
+    snapshot per product that moved. Returns the number of snapshots written.
+
+    Only movements up to settled_movement_id() are folded, so a movement an
+    open transaction commits later can never fall below a snapshot and be left
+    out of it. Movements younger than ``settle_seconds`` are also left for the
+    next run, keeping point-in-time queries over the latest few seconds exact.
+    """
+    settled = settled_movement_id()
+    cutoff_time = timezone.now() - timedelta(seconds=settle_seconds)
+
+    with transaction.atomic():
+        previous = StockSnapshot.objects.aggregate(last=Max("last_movement_id"))["last"] or 0
+        cutoff = StockMovement.objects.filter(
+            created_at__lte=cutoff_time, movement_id__lte=settled or 0,
+        ).aggregate(last=Max("movement_id"))["last"]
+        if cutoff is None or cutoff <= previous:
+            return 0
+
+        movements = StockMovement.objects.filter(movement_id__lte=cutoff)
+        moved = (
+            movements.filter(movement_id__gt=previous)
+            .order_by("product_id").values_list("product_id", flat=True).distinct()
+        )
+
+        written = 0
+        for product_ids in batches(moved):
+            rows = _with_levels(
+                Product.objects.filter(product_id__in=product_ids), StockSnapshot.objects.all(), movements,
+            ).values("product_id", *[f"ledger_{field}" for field in MOVEMENT_FIELDS])
+            snapshots = StockSnapshot.objects.bulk_create([
+                StockSnapshot(product_id=product_id, last_movement_id=cutoff, taken_at=cutoff_time, **levels)
+                for product_id, levels in _levels(rows).items()
+            ], ignore_conflicts=True)
+            written += len(snapshots)
+    return written
+
+
+def prune(before):
+    """
+    Deletes movements already folded into a snapshot taken before ``before``.
+    Point-in-time queries earlier than that snapshot lose their detail.
+    Returns the number of movements deleted.
+    """
+    folded = StockSnapshot.objects.filter(taken_at__lt=before).aggregate(last=Max("last_movement_id"))["last"]
+    if not folded:
+        return 0
+    deleted, _ = StockMovement.objects.filter(movement_id__lte=folded).delete()
+    return deleted
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from app.allocation import run_allocation, AllocationError, STRATEGIES, DEFAULT_STRATEGY, DEFAULT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = "Allocates the pending order backlog; several processes can run it at the same time"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--strategy", choices=sorted(STRATEGIES), default=DEFAULT_STRATEGY)
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                            help="Orders claimed per transaction")
+
+    def handle(self, *args, **kwargs):
+        def progress(orders_seen, shipments_planned, orders_skipped):
+            self.stdout.write(f"Processed {orders_seen} orders, {shipments_planned} shipments planned, {orders_skipped} orders skipped")
+
+        try:
+            result = run_allocation(kwargs["strategy"], chunk_size=kwargs["chunk_size"], progress=progress)
+        except AllocationError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Allocated {len(result['allocated_orders'])} shipments, skipped {len(result['skipped_orders'])} orders"
+        ))
@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand
+from app.jobs import claim_next_job, fail_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Runs queued allocation jobs submitted through /api/allocation-jobs/"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Run the queued jobs, then exit")
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between polls when idle")
+        parser.add_argument("--stale-after", type=int, default=600,
+                            help="Fail running jobs without progress for this many seconds")
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write("Allocation worker started, waiting for jobs...")
+
+        while True:
+            stale = fail_stale_jobs(kwargs["stale_after"])
+            if stale:
+                self.stdout.write(f"[⚠] Marked {stale} stale job(s) as failed")
+
+            job = claim_next_job()
+            if job is None:
+                if kwargs["once"]:
+                    break
+                time.sleep(kwargs["poll_interval"])
+                continue
+
+            self.stdout.write(f"Running allocation job {job.job_id} ({job.strategy})")
+            job = run_job(job)
+            self.stdout.write(f"Allocation job {job.job_id} {job.status} in {job.duration_ms} ms")
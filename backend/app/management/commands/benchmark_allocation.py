@@ -0,0 +1,79 @@
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from app.allocation import run_allocation, load_available_trucks, AllocationError, STRATEGIES, DEFAULT_CHUNK_SIZE
+
+
+class Rollback(Exception):
+    """Used to undo a benchmark run once it has been measured."""
+
+
+class Command(BaseCommand):
+    help = "Runs allocation over the current pending backlog and reports time, queries and truck utilisation"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--strategy", action="append", choices=sorted(STRATEGIES),
+                            help="Strategy to measure, can be repeated (default: all)")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument("--keep", action="store_true",
+                            help="Keep the allocation of the (last) run instead of rolling it back")
+        parser.add_argument("--json", action="store_true", help="Print one JSON object per strategy")
+
+    def handle(self, *args, **kwargs):
+        strategies = kwargs["strategy"] or sorted(STRATEGIES)
+
+        for name in strategies:
+            keep = kwargs["keep"] and name == strategies[-1]
+            try:
+                report = self.measure(name, kwargs["chunk_size"], keep)
+            except AllocationError as e:
+                raise CommandError(str(e))
+
+            if kwargs["json"]:
+                self.stdout.write(json.dumps(report))
+            else:
+                self.stdout.write(
+                    f"{report['strategy']:<22} {report['wall_time_ms']:>10.1f} ms {report['queries']:>6} queries  "
+                    f"allocated {report['orders_allocated']:>6}  skipped {report['orders_skipped']:>6}  "
+                    f"shipments {report['shipments']:>6}  trucks used {report['trucks_used']}/{report['trucks_available']}  "
+                    f"utilisation {report['fleet_utilisation']:.1%} (loaded trucks {report['loaded_truck_utilisation']:.1%})"
+                )
+
+    def measure(self, strategy, chunk_size, keep):
+        report = {}
+        try:
+            with transaction.atomic():
+                trucks = load_available_trucks()
+
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    result = run_allocation(strategy, chunk_size=chunk_size)
+                    report["wall_time_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+                shipments = result["allocated_orders"]
+                capacity = {truck.employee_id: truck.capacity for truck in trucks}
+                load = {}
+                for shipment in shipments:
+                    load[shipment["employee_id"]] = load.get(shipment["employee_id"], 0) + shipment["quantity"]
+                total_load = sum(load.values())
+                used_capacity = sum(capacity.get(employee_id, 0) for employee_id in load)
+
+                report.update({
+                    "strategy": result["strategy"],
+                    "queries": len(queries.captured_queries),
+                    "orders_allocated": len({shipment["order_id"] for shipment in shipments if shipment["status"] == "allocated"}),
+                    "orders_skipped": len(result["skipped_orders"]),
+                    "shipments": len(shipments),
+                    "allocated_quantity": total_load,
+                    "trucks_available": len(trucks),
+                    "trucks_used": len(load),
+                    "fleet_utilisation": total_load / sum(capacity.values()) if capacity else 0.0,
+                    "loaded_truck_utilisation": total_load / used_capacity if used_capacity else 0.0,
+                })
+                if not keep:
+                    raise Rollback()
+        except Rollback:
+            pass
+        return report
@@ -0,0 +1,22 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from app.ledger import compact, prune
+
+
+class Command(BaseCommand):
+    help = "Folds recent stock movements into per-product snapshots (run periodically, e.g. from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--settle-seconds", type=int, default=60,
+                            help="Leave movements younger than this for the next run")
+        parser.add_argument("--prune-days", type=int, default=None,
+                            help="Also delete movements folded into snapshots older than this many days")
+
+    def handle(self, *args, **kwargs):
+        written = compact(kwargs["settle_seconds"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} stock snapshot(s)"))
+
+        if kwargs["prune_days"] is not None:
+            deleted = prune(timezone.now() - timedelta(days=kwargs["prune_days"]))
+            self.stdout.write(f"Pruned {deleted} folded movement(s)")
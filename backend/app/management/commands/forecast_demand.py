@@ -0,0 +1,23 @@
+import time
+from django.core.management.base import BaseCommand
+from app.forecasting import (
+    update_forecasts, DEFAULT_ALPHA, DEFAULT_HISTORY_DAYS, DEFAULT_LEAD_TIME_DAYS, DEFAULT_SERVICE_LEVEL,
+)
+
+
+class Command(BaseCommand):
+    help = "Recomputes demand forecasts and reorder points for every product from its order history (run e.g. nightly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--history-days", type=int, default=DEFAULT_HISTORY_DAYS)
+        parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA, help="Smoothing factor, 0 < alpha <= 1")
+        parser.add_argument("--lead-time", type=int, default=DEFAULT_LEAD_TIME_DAYS, help="Restock lead time in days")
+        parser.add_argument("--service-level", type=float, default=DEFAULT_SERVICE_LEVEL,
+                            help="Probability of not running out during the lead time")
+
+    def handle(self, *args, **kwargs):
+        started = time.perf_counter()
+        count = update_forecasts(kwargs["history_days"], kwargs["alpha"], kwargs["lead_time"], kwargs["service_level"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Forecast {count} product(s) in {(time.perf_counter() - started) * 1000:.0f} ms"
+        ))
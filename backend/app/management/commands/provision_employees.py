@@ -0,0 +1,13 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from app.employees import EMPLOYEE_GROUP, provision_employees
+
+
+class Command(BaseCommand):
+    help = "Creates missing Employee profiles (and assigns free trucks) for every user in the employee group"
+
+    def handle(self, *args, **kwargs):
+        # No profile yet, or a profile without a truck
+        users = User.objects.filter(groups__name__iexact=EMPLOYEE_GROUP, employee_profile__truck__isnull=True).distinct()
+        count = provision_employees(users)
+        self.stdout.write(self.style.SUCCESS(f"Provisioned {count} employee(s)"))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from app.models import Category
+from app.stock import adjust_quantities, iter_counter_drift, refresh_category_summaries, BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Recomputes Product.total_required_quantity and total_shipped from orders and shipments and reports (or fixes) drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=BATCH_SIZE, help="Product ids per range")
+        parser.add_argument("--fix", action="store_true", help="Correct drifted counters (recorded in the stock ledger) and rebuild the category summaries")
+        parser.add_argument("--show", type=int, default=20, help="Print at most this many drifted products")
+
+    def handle(self, *args, **kwargs):
+        checked = drifted = shown = 0
+        totals = {"total_required_quantity": 0, "total_shipped": 0}
+
+        for chunk_checked, drift in iter_counter_drift(kwargs["chunk_size"]):
+            checked += chunk_checked
+            drifted += len(drift)
+
+            for product_id, fields in drift.items():
+                for field, (recorded, actual) in fields.items():
+                    totals[field] += abs(actual - recorded)
+                if shown < kwargs["show"]:
+                    shown += 1
+                    details = ", ".join(f"{field} {recorded} -> {actual}" for field, (recorded, actual) in fields.items())
+                    self.stdout.write(f"Product {product_id}: {details}")
+
+            if kwargs["fix"] and drift:
+                # Relative corrections, so concurrent updates in between are not overwritten
+                with transaction.atomic():
+                    adjust_quantities(
+                        {
+                            product_id: {field: actual - recorded for field, (recorded, actual) in fields.items()}
+                            for product_id, fields in drift.items()
+                        },
+                        kind="adjustment", reference="reconciliation",
+                    )
+
+        self.stdout.write(
+            f"Checked {checked} product(s), {drifted} drifted "
+            f"(required off by {totals['total_required_quantity']}, shipped off by {totals['total_shipped']})"
+        )
+        if kwargs["fix"]:
+            # Writes keep the category summaries up to date by deltas; rebuild them from the products
+            category_ids = list(Category.objects.values_list("category_id", flat=True))
+            refresh_category_summaries(category_ids=category_ids)
+            self.stdout.write(self.style.SUCCESS(f"Fixed {drifted} product(s), rebuilt {len(category_ids)} category summaries"))
@@ -0,0 +1,106 @@
+import random
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from app.cache import bump, CATEGORIES, EMPLOYEES, ORDERS, PRODUCTS, RETAILERS, TRUCKS
+from app.models import Category, Product, Retailer, Order, Truck, Employee
+from app.stock import record_opening_balances, refresh_category_summaries
+
+# Every seeded row is recognisable by this prefix, so --clear never touches real data
+PREFIX = "seed"
+
+
+class Command(BaseCommand):
+    help = "Seeds a synthetic dataset (categories, products, retailers, trucks, employees, orders) for benchmarks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=42, help="Random seed, the same seed gives the same data")
+        parser.add_argument("--categories", type=int, default=10)
+        parser.add_argument("--products", type=int, default=500)
+        parser.add_argument("--retailers", type=int, default=200)
+        parser.add_argument("--trucks", type=int, default=50)
+        parser.add_argument("--employees", type=int, default=None, help="Defaults to one employee per truck")
+        parser.add_argument("--orders", type=int, default=5000)
+        parser.add_argument("--clear", action="store_true", help="Delete previously seeded rows first")
+
+    def handle(self, *args, **kwargs):
+        rng = random.Random(kwargs["seed"])
+        employee_count = kwargs["employees"] if kwargs["employees"] is not None else kwargs["trucks"]
+
+        with transaction.atomic():
+            if kwargs["clear"]:
+                self.clear()
+
+            categories = Category.objects.bulk_create(
+                [Category(name=f"{PREFIX}-category-{i}") for i in range(kwargs["categories"])]
+            )
+            products = Product.objects.bulk_create([
+                Product(
+                    name=f"{PREFIX}-product-{i}",
+                    category=rng.choice(categories),
+                    available_quantity=rng.randint(0, 2000),
+                    price=Decimal(rng.randint(100, 100000)) / 100,
+                )
+                for i in range(kwargs["products"])
+            ], batch_size=1000)
+            retailers = Retailer.objects.bulk_create([
+                Retailer(
+                    name=f"{PREFIX}-retailer-{i}",
+                    address=f"{i} Seed Street",
+                    contact=f"{rng.randint(10**9, 10**10 - 1)}",
+                    distance_from_warehouse=round(rng.uniform(1, 150), 1),
+                )
+                for i in range(kwargs["retailers"])
+            ], batch_size=1000)
+            trucks = Truck.objects.bulk_create([
+                Truck(license_plate=f"{PREFIX.upper()}-{i:05d}", capacity=capacity, remaining_capacity=capacity)
+                for i, capacity in enumerate(rng.randint(50, 500) for _ in range(kwargs["trucks"]))
+            ], batch_size=1000)
+
+            # bulk_create skips the User post_save hooks, employees are linked explicitly
+            users = User.objects.bulk_create(
+                [User(username=f"{PREFIX}-employee-{i}") for i in range(employee_count)], batch_size=1000
+            )
+            Employee.objects.bulk_create([
+                Employee(user=user, truck=trucks[i] if i < len(trucks) else None)
+                for i, user in enumerate(users)
+            ], batch_size=1000)
+            Truck.objects.filter(pk__in=[truck.pk for truck in trucks[:len(users)]]).update(is_available=False)
+
+            Order.objects.bulk_create([
+                Order(
+                    retailer=rng.choice(retailers),
+                    product=rng.choice(products),
+                    required_qty=rng.randint(1, 60),
+                )
+                for _ in range(kwargs["orders"])
+            ], batch_size=1000)
+
+            # bulk_create also skips the Order hooks, so derive the counters in one pass
+            required = (
+                Order.objects.filter(product=OuterRef("pk"), status__in=["pending", "allocated"])
+                .values("product").annotate(total=Sum("required_qty")).values("total")
+            )
+            seeded = Product.objects.filter(name__startswith=f"{PREFIX}-")
+            seeded.update(total_required_quantity=Coalesce(Subquery(required), 0))
+            seeded.update(status=Product.status_expression())
+            # ... and open their stock ledger from the final counters
+            record_opening_balances([product.pk for product in products], reference="seed")
+            refresh_category_summaries(category_ids=[category.pk for category in categories])
+            # bulk_create sends no post_save, so invalidate the cached responses explicitly
+            bump(CATEGORIES, PRODUCTS, RETAILERS, TRUCKS, EMPLOYEES, ORDERS)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(categories)} categories, {len(products)} products, {len(retailers)} retailers, "
+            f"{len(trucks)} trucks, {len(users)} employees and {kwargs['orders']} orders (seed {kwargs['seed']})"
+        ))
+
+    def clear(self):
+        # Categories cascade to products, orders and shipments
+        Category.objects.filter(name__startswith=f"{PREFIX}-").delete()
+        Retailer.objects.filter(name__startswith=f"{PREFIX}-").delete()
+        User.objects.filter(username__startswith=f"{PREFIX}-").delete()
+        Truck.objects.filter(license_plate__startswith=f"{PREFIX.upper()}-").delete()
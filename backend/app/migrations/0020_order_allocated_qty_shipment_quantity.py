@@ -0,0 +1,41 @@
+# Generated by Django 5.1.6 on 2026-10-17 01:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_quantities(apps, schema_editor):
+    """Existing shipments each carried a whole order."""
+    Order = apps.get_model('app', 'Order')
+    Shipment = apps.get_model('app', 'Shipment')
+
+    required_qty = Order.objects.filter(pk=OuterRef('order_id')).values('required_qty')[:1]
+    Shipment.objects.update(quantity=Subquery(required_qty))
+    Order.objects.filter(shipments__isnull=False).update(allocated_qty=models.F('required_qty'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0019_product_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='allocated_qty',
+            field=models.PositiveIntegerField(default=0, help_text='Quantity already assigned to shipments'),
+        ),
+        migrations.AddField(
+            model_name='shipment',
+            name='quantity',
+            field=models.PositiveIntegerField(default=0, help_text="Part of the order's quantity carried by this shipment"),
+        ),
+        migrations.AlterField(
+            model_name='shipment',
+            name='order',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shipments', to='app.order'),
+        ),
+        migrations.RunPython(backfill_quantities, migrations.RunPython.noop),
+    ]
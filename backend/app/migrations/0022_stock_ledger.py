@@ -0,0 +1,66 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:04
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def open_ledger(apps, schema_editor):
+    """Existing counters become each product's opening snapshot; history starts here."""
+    Product = apps.get_model('app', 'Product')
+    StockSnapshot = apps.get_model('app', 'StockSnapshot')
+
+    now = timezone.now()
+    StockSnapshot.objects.bulk_create([
+        StockSnapshot(
+            product_id=product_id, available_quantity=available, total_required_quantity=required,
+            total_shipped=shipped, last_movement_id=0, taken_at=now,
+        )
+        for product_id, available, required, shipped in Product.objects.values_list(
+            'product_id', 'available_quantity', 'total_required_quantity', 'total_shipped'
+        ).iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0021_allocationjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('movement_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('receipt', 'Receipt'), ('reservation', 'Reservation'), ('shipment', 'Shipment'), ('delivery', 'Delivery'), ('cancellation', 'Cancellation'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('available_delta', models.IntegerField(default=0)),
+                ('required_delta', models.IntegerField(default=0)),
+                ('shipped_delta', models.IntegerField(default=0)),
+                ('reference', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='app.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'movement_id'], name='app_stockmo_product_56e3d1_idx'), models.Index(fields=['created_at'], name='app_stockmo_created_7a2221_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('snapshot_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('available_quantity', models.IntegerField()),
+                ('total_required_quantity', models.IntegerField()),
+                ('total_shipped', models.IntegerField()),
+                ('last_movement_id', models.BigIntegerField()),
+                ('taken_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='app.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'taken_at'], name='app_stocksn_product_df73bf_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'last_movement_id'), name='one_stock_snapshot_per_cutoff')],
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
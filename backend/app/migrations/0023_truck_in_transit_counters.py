@@ -0,0 +1,41 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:07
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+
+def backfill_counters(apps, schema_editor):
+    """Derive the counters once from the shipments currently in transit."""
+    Truck = apps.get_model('app', 'Truck')
+    Shipment = apps.get_model('app', 'Shipment')
+
+    in_transit = Shipment.objects.filter(employee__truck=OuterRef('pk'), status='in_transit').values('employee__truck')
+    Truck.objects.update(
+        in_transit_count=Coalesce(Subquery(in_transit.annotate(n=Count('pk')).values('n')), 0),
+        remaining_capacity=Greatest(
+            F('capacity') - Coalesce(Subquery(in_transit.annotate(total=Sum('quantity')).values('total')), 0),
+            Value(0),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0022_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='truck',
+            name='in_transit_count',
+            field=models.PositiveIntegerField(default=0, help_text='Shipments currently in transit on this truck'),
+        ),
+        migrations.AddField(
+            model_name='truck',
+            name='remaining_capacity',
+            field=models.PositiveIntegerField(default=0, help_text='Capacity left after the shipments in transit'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
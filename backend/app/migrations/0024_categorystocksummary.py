@@ -0,0 +1,43 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+def build_summaries(apps, schema_editor):
+    Category = apps.get_model('app', 'Category')
+    CategoryStockSummary = apps.get_model('app', 'CategoryStockSummary')
+
+    rows = Category.objects.values('category_id').annotate(
+        product_count=Count('products'),
+        on_demand_count=Count('products', filter=Q(products__status='on_demand')),
+        available_quantity=Coalesce(Sum('products__available_quantity'), 0),
+        total_required_quantity=Coalesce(Sum('products__total_required_quantity'), 0),
+        total_shipped=Coalesce(Sum('products__total_shipped'), 0),
+    )
+    CategoryStockSummary.objects.bulk_create([CategoryStockSummary(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0023_truck_in_transit_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryStockSummary',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock_summary', serialize=False, to='app.category')),
+                ('product_count', models.PositiveIntegerField(default=0)),
+                ('on_demand_count', models.PositiveIntegerField(default=0)),
+                ('available_quantity', models.PositiveBigIntegerField(default=0)),
+                ('total_required_quantity', models.PositiveBigIntegerField(default=0)),
+                ('total_shipped', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
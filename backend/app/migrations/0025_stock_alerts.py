@@ -0,0 +1,51 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0024_categorystocksummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockAlertRule',
+            fields=[
+                ('rule_id', models.AutoField(primary_key=True, serialize=False)),
+                ('min_available', models.PositiveIntegerField(blank=True, help_text='Alert when the available quantity drops below this', null=True)),
+                ('alert_on_demand', models.BooleanField(default=True, help_text='Alert when the product goes on demand')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='alert_rules', to='app.category')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='alert_rules', to='app.product')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('alert_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('low_stock', 'Low Stock'), ('on_demand', 'On Demand')], max_length=20)),
+                ('available_quantity', models.PositiveIntegerField()),
+                ('total_required_quantity', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='app.product')),
+                ('rule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='app.stockalertrule')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='stockalertrule',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('category__isnull', True), ('product__isnull', False)), models.Q(('category__isnull', False), ('product__isnull', True)), _connector='OR'), name='stock_alert_rule_product_or_category'),
+        ),
+        migrations.AddIndex(
+            model_name='stockalert',
+            index=models.Index(fields=['created_at'], name='app_stockal_created_004378_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='stockalert',
+            constraint=models.UniqueConstraint(condition=models.Q(('resolved_at__isnull', True)), fields=('rule', 'product', 'kind'), name='one_open_stock_alert'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0025_stock_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductForecast',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='forecast', serialize=False, to='app.product')),
+                ('daily_demand', models.FloatField(help_text='Exponentially smoothed units ordered per day')),
+                ('demand_std', models.FloatField(help_text='Standard deviation of daily demand over the history window')),
+                ('safety_stock', models.PositiveIntegerField()),
+                ('reorder_point', models.PositiveIntegerField(help_text='Reorder when available stock falls below this')),
+                ('lead_time_days', models.PositiveIntegerField()),
+                ('history_days', models.PositiveIntegerField()),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='stockalertrule',
+            name='below_reorder_point',
+            field=models.BooleanField(default=False, help_text='Alert when available stock falls below the forecast reorder point'),
+        ),
+        migrations.AlterField(
+            model_name='stockalert',
+            name='kind',
+            field=models.CharField(choices=[('low_stock', 'Low Stock'), ('on_demand', 'On Demand'), ('reorder', 'Below Reorder Point')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.6 on 2026-10-17 02:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0026_product_forecast'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'order_date', 'order_id'], name='app_order_status_a43fe5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['order_date', 'order_id'], name='app_order_order_d_c985e0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['status'], name='app_product_status_5246b8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['name', 'category'], name='app_product_name_616e8e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['employee', 'status'], name='app_shipmen_employe_1feb98_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['order', 'status'], name='app_shipmen_order_i_b52251_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['status', 'shipment_date', 'shipment_id'], name='app_shipmen_status_e15d6d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(fields=['shipment_date', 'shipment_id'], name='app_shipmen_shipmen_27be49_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.6 on 2026-10-17 09:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+# The resources of app/cache.py at the time of this migration; later ones get their row on first change
+RESOURCES = ["orders", "shipments", "products", "categories", "employees", "retailers", "trucks", "admin_log"]
+
+
+def create_versions(apps, schema_editor):
+    ResourceVersion = apps.get_model("app", "ResourceVersion")
+    ResourceVersion.objects.bulk_create([ResourceVersion(resource=resource) for resource in RESOURCES], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0027_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceVersion',
+            fields=[
+                ('resource', models.CharField(max_length=30, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,80 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
-from django.db.models import Count
+from django.db.models import Case, Count, F, Value, When
+from django.db.models.functions import Greatest
 from decimal import Decimal
 
 
+class TrackedFieldsMixin:
+    """
+    Remembers the values of ``tracked_fields`` as loaded from (or last saved to)
+    the database, so save hooks know what changed without re-fetching the row.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values) if name in cls.tracked_fields
+        }
+        return instance
+
+    def _ensure_tracked(self):
+        # Instances built by hand with an existing pk were never loaded: read them once
+        if not hasattr(self, '_loaded_values'):
+            if self.pk is None:
+                self._loaded_values = {}
+            else:
+                loaded = type(self)._base_manager.filter(pk=self.pk).values(*self.tracked_fields).first()
+                self._loaded_values = loaded or {}
+
+    def _load_deferred_tracked(self):
+        # Tracked fields deferred when the row was loaded (.only()/.defer()) are
+        # read once before saving, so the save hooks still see their old values
+        missing = [field for field in self.tracked_fields if field not in self._loaded_values]
+        if missing and not self._state.adding:
+            loaded = type(self)._base_manager.filter(pk=self.pk).values(*missing).first()
+            self._loaded_values.update(loaded or {})
+
+    def previous_value(self, field):
+        """Value of ``field`` as last loaded or saved; None for new instances."""
+        self._ensure_tracked()
+        return self._loaded_values.get(field)
+
+    def has_changed(self, field):
+        """True if ``field`` differs from its loaded value (always True for new instances)."""
+        self._ensure_tracked()
+        if field not in self._loaded_values:
+            return True
+        return self._loaded_values[field] != getattr(self, field)
+
+    def _reset_tracking(self, fields=None):
+        deferred = self.get_deferred_fields()
+        fields = [
+            field for field in self.tracked_fields
+            if field not in deferred and (fields is None or field in fields)
+        ]
+        self._loaded_values.update({field: getattr(self, field) for field in fields})
+
+    def save(self, *args, **kwargs):
+        self._ensure_tracked()
+        self._load_deferred_tracked()
+        super().save(*args, **kwargs)
+        # post_save handlers have run by now and could still read the old values
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = {self._meta.get_field(name).attname for name in update_fields}
+        self._reset_tracking(update_fields)
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        if not hasattr(self, '_loaded_values'):
+            self._loaded_values = {}
+        self._reset_tracking(kwargs.get('fields'))
+
+
 class Category(models.Model):
     category_id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=255, unique=True)
@@ -19,7 +90,9 @@ class Category(models.Model):
         return cls.objects.annotate(product_count=Count('products'))
 
 
-class Product(models.Model):
+class Product(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('available_quantity', 'total_required_quantity', 'total_shipped', 'status', 'category_id')
+
     product_id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=255)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="products")
@@ -34,12 +107,31 @@ class Product(models.Model):
     ]
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='sufficient')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status']),
+            models.Index(fields=['name', 'category']),  # store_qr_code's get_or_create
+        ]
+
     def update_status(self):
         """Update the status based on available and required quantity."""
         available = self.available_quantity if isinstance(self.available_quantity, int) else 0
         required = self.total_required_quantity if isinstance(self.total_required_quantity, int) else 0
 
-        self.status = 'sufficient' if available > required else 'on_demand'
+        self.status = self.status_for(available, required)
+
+    @staticmethod
+    def status_for(available, required):
+        """The status rule itself, for counters computed outside an instance (see app/stock.py)."""
+        return 'sufficient' if available > required else 'on_demand'
+
+    @staticmethod
+    def status_expression():
+        """The update_status rule as a SQL expression, for set-based refreshes (see app/stock.py)."""
+        return Case(
+            When(available_quantity__gt=F('total_required_quantity'), then=Value('sufficient')),
+            default=Value('on_demand'),
+        )
 
     def save(self, *args, **kwargs):
         self.update_status()
@@ -50,6 +142,38 @@ class Product(models.Model):
 
 
 
+class CategoryStockSummary(models.Model):
+    """
+    Per-category stock totals for the dashboards, kept up to date by
+    app/stock.py whenever the products of a category change.
+    """
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, primary_key=True, related_name="stock_summary")
+    product_count = models.PositiveIntegerField(default=0)
+    on_demand_count = models.PositiveIntegerField(default=0)
+    available_quantity = models.PositiveBigIntegerField(default=0)
+    total_required_quantity = models.PositiveBigIntegerField(default=0)
+    total_shipped = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stock summary - {self.category_id}"
+
+
+class ProductForecast(models.Model):
+    """Demand forecast and reorder point of a product, written by the forecast_demand command (see app/forecasting.py)."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name="forecast")
+    daily_demand = models.FloatField(help_text="Exponentially smoothed units ordered per day")
+    demand_std = models.FloatField(help_text="Standard deviation of daily demand over the history window")
+    safety_stock = models.PositiveIntegerField()
+    reorder_point = models.PositiveIntegerField(help_text="Reorder when available stock falls below this")
+    lead_time_days = models.PositiveIntegerField()
+    history_days = models.PositiveIntegerField()
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Forecast - {self.product_id}"
+
+
 class Retailer(models.Model):
     retailer_id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=255)
@@ -61,11 +185,14 @@ class Retailer(models.Model):
         return self.name
 
 
-class Order(models.Model):
+class Order(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('product_id', 'required_qty', 'status')
+
     order_id = models.AutoField(primary_key=True)
     retailer = models.ForeignKey(Retailer, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     required_qty = models.PositiveIntegerField()
+    allocated_qty = models.PositiveIntegerField(default=0, help_text="Quantity already assigned to shipments")
     order_date = models.DateTimeField(auto_now_add=True)
 
     STATUS_CHOICES = [
@@ -76,15 +203,52 @@ class Order(models.Model):
     ]
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
 
+    class Meta:
+        indexes = [
+            # Pending backlog in allocation order, orders list filtered by status (keyset on date, id)
+            models.Index(fields=['status', 'order_date', 'order_id']),
+            models.Index(fields=['order_date', 'order_id']),
+        ]
+
+    @property
+    def outstanding_qty(self):
+        """Quantity not yet assigned to any shipment."""
+        return max(0, self.required_qty - self.allocated_qty)
+
     def __str__(self):
         return f"Order {self.order_id} - {self.product.name} - {self.retailer.name}"
 
 
-class Truck(models.Model):
+class Truck(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('capacity',)
+    # Maintained in SQL as shipments change state (see allocation.adjust_truck_loads)
+    maintained_fields = ('in_transit_count', 'remaining_capacity')
+
     truck_id = models.AutoField(primary_key=True)
     license_plate = models.CharField(max_length=20, unique=True)
     capacity = models.PositiveIntegerField(help_text="Maximum shipment capacity")
     is_available = models.BooleanField(default=True)
+    in_transit_count = models.PositiveIntegerField(default=0, help_text="Shipments currently in transit on this truck")
+    remaining_capacity = models.PositiveIntegerField(default=0, help_text="Capacity left after the shipments in transit")
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.remaining_capacity = self.capacity
+            return super().save(*args, **kwargs)
+
+        # Never write back a stale copy of the maintained counters
+        if kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.maintained_fields
+            ]
+        capacity_change = self.capacity - self.previous_value('capacity') if self.has_changed('capacity') else 0
+        super().save(*args, **kwargs)
+
+        if capacity_change:
+            Truck.objects.filter(pk=self.pk).update(
+                remaining_capacity=Greatest(F('remaining_capacity') + capacity_change, Value(0))
+            )
 
     def __str__(self):
         return self.license_plate
@@ -100,10 +264,13 @@ class Employee(models.Model):
         return f"{self.user.username} (Truck: {self.truck.license_plate if self.truck else 'No Truck Assigned'})"
 
 
-class Shipment(models.Model):
+class Shipment(TrackedFieldsMixin, models.Model):
+    tracked_fields = ('employee_id', 'quantity', 'status')
+
     shipment_id = models.AutoField(primary_key=True)
-    order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name="shipment")
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="shipments")  # An order can be split across trucks
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="shipments")
+    quantity = models.PositiveIntegerField(default=0, help_text="Part of the order's quantity carried by this shipment")
     shipment_date = models.DateTimeField(auto_now_add=True)
 
     STATUS_CHOICES = [
@@ -113,28 +280,196 @@ class Shipment(models.Model):
     ]
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='in_transit')
 
-    def save(self, *args, **kwargs):
-        """
-        If shipment is marked as 'delivered', update:
-        - The corresponding order's status to 'delivered'.
-        - Reduce the product's total_required_quantity.
-        - Increase the product's total_shipped.
-        """
-        if self.status == "delivered":
-            order = self.order
-            product = order.product
+    class Meta:
+        indexes = [
+            models.Index(fields=['employee', 'status']),  # An employee's shipments, trucks in transit
+            models.Index(fields=['order', 'status']),  # Open / delivered shipments of an order
+            models.Index(fields=['status', 'shipment_date', 'shipment_id']),
+            models.Index(fields=['shipment_date', 'shipment_id']),  # Shipments list (keyset on date, id)
+        ]
 
-            # Update order status
-            order.status = "delivered"
-            order.save(update_fields=["status"])
+    def __str__(self):
+        truck_license_plate = getattr(self.employee.truck, 'license_plate', 'No Truck Assigned')
+        return f"Shipment {self.shipment_id} - {truck_license_plate}"
 
-            # Update product details
-            product.total_required_quantity = max(0, product.total_required_quantity - order.required_qty)
-            product.total_shipped += order.required_qty
-            product.save(update_fields=["total_required_quantity", "total_shipped"])
 
-        super().save(*args, **kwargs)
+
+class AllocationJob(models.Model):
+    """A background allocation run, executed by the allocation_worker command."""
+    job_id = models.AutoField(primary_key=True)
+    kind = models.CharField(max_length=30, default="full_pass")
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed')
+    ]
+    ACTIVE_STATUSES = ['queued', 'running']
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+
+    strategy = models.CharField(max_length=50, blank=True)
+    chunk_size = models.PositiveIntegerField(null=True, blank=True)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+
+    # Progress, updated after every committed chunk
+    orders_processed = models.PositiveIntegerField(default=0)
+    shipments_created = models.PositiveIntegerField(default=0)
+    orders_skipped = models.PositiveIntegerField(default=0)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Worker heartbeat
+
+    class Meta:
+        constraints = [
+            # At most one queued or running job per kind, so submissions are deduplicated
+            models.UniqueConstraint(
+                fields=['kind'],
+                condition=models.Q(status__in=['queued', 'running']),
+                name='one_active_allocation_job_per_kind',
+            ),
+        ]
+
+    @property
+    def duration_ms(self):
+        if not self.started_at:
+            return None
+        end = self.finished_at or self.updated_at
+        return round((end - self.started_at).total_seconds() * 1000)
 
     def __str__(self):
-        truck_license_plate = getattr(self.employee.truck, 'license_plate', 'No Truck Assigned')
-        return f"Shipment {self.shipment_id} - {truck_license_plate}"
+        return f"Allocation job {self.job_id} ({self.status})"
+
+
+class StockMovement(models.Model):
+    """
+    One signed change to a product's counters. Rows are only ever appended,
+    in the same transaction that updates the counters on Product, so those
+    counters are the running total of this ledger.
+    """
+    KIND_CHOICES = [
+        ('receipt', 'Receipt'),
+        ('reservation', 'Reservation'),
+        ('shipment', 'Shipment'),
+        ('delivery', 'Delivery'),
+        ('cancellation', 'Cancellation'),
+        ('adjustment', 'Adjustment')
+    ]
+
+    movement_id = models.BigAutoField(primary_key=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="movements")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    available_delta = models.IntegerField(default=0)
+    required_delta = models.IntegerField(default=0)
+    shipped_delta = models.IntegerField(default=0)
+    reference = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'movement_id']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.movement_id} - {self.product_id}"
+
+
+class StockSnapshot(models.Model):
+    """
+    A product's counters with every movement up to ``last_movement_id`` folded
+    in, written by the compact_stock_ledger command.
+    """
+    snapshot_id = models.BigAutoField(primary_key=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="snapshots")
+    available_quantity = models.IntegerField()
+    total_required_quantity = models.IntegerField()
+    total_shipped = models.IntegerField()
+    last_movement_id = models.BigIntegerField()
+    taken_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'last_movement_id'], name='one_stock_snapshot_per_cutoff'),
+        ]
+        indexes = [models.Index(fields=['product', 'taken_at'])]
+
+    def __str__(self):
+        return f"Snapshot {self.product_id} @ {self.taken_at}"
+
+
+class StockAlertRule(models.Model):
+    """
+    A low-stock threshold for one product or for every product of a category,
+    evaluated whenever a matching product's quantities change (see app/alerts.py).
+    """
+    rule_id = models.AutoField(primary_key=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True, blank=True, related_name="alert_rules")
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name="alert_rules")
+    min_available = models.PositiveIntegerField(null=True, blank=True, help_text="Alert when the available quantity drops below this")
+    alert_on_demand = models.BooleanField(default=True, help_text="Alert when the product goes on demand")
+    below_reorder_point = models.BooleanField(default=False, help_text="Alert when available stock falls below the forecast reorder point")
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # A rule targets either one product or one category
+            models.CheckConstraint(
+                condition=models.Q(product__isnull=False, category__isnull=True)
+                | models.Q(product__isnull=True, category__isnull=False),
+                name='stock_alert_rule_product_or_category',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Alert rule {self.rule_id} - {self.product or self.category}"
+
+
+class StockAlert(models.Model):
+    """An alert raised by a StockAlertRule; stays open until its condition clears."""
+    KIND_CHOICES = [
+        ('low_stock', 'Low Stock'),
+        ('on_demand', 'On Demand'),
+        ('reorder', 'Below Reorder Point')
+    ]
+
+    alert_id = models.BigAutoField(primary_key=True)
+    rule = models.ForeignKey(StockAlertRule, on_delete=models.CASCADE, related_name="alerts")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="alerts")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    available_quantity = models.PositiveIntegerField()
+    total_required_quantity = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['rule', 'product', 'kind'],
+                condition=models.Q(resolved_at__isnull=True),
+                name='one_open_stock_alert',
+            ),
+        ]
+        indexes = [models.Index(fields=['created_at'])]
+
+    def __str__(self):
+        return f"{self.kind} alert {self.alert_id} - {self.product_id}"
+
+
+class ResourceVersion(models.Model):
+    """
+    How many times a group of cached data (see app/cache.py) has changed, and
+    when it last did. Kept in the database so every process, worker and
+    management command sees the same versions.
+    """
+    resource = models.CharField(max_length=30, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.resource} v{self.version}"
@@ -0,0 +1,102 @@
+from collections import Counter
+from django.db import transaction
+from .cache import bump, ORDERS
+from .models import Order, Product, Retailer
+from .stock import adjust_quantities, batches, BATCH_SIZE
+
+MAX_BULK_ORDERS = 10000
+
+
+class OrderValidationError(Exception):
+    """Raised when a bulk upload has invalid rows; ``errors`` lists them by index."""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} invalid order(s)")
+        self.errors = errors
+
+
+def _existing_ids(model, ids):
+    """Returns the subset of ``ids`` that exist, one query per batch."""
+    existing = set()
+    for batch in batches(ids):
+        existing.update(model.objects.filter(pk__in=batch).values_list("pk", flat=True))
+    return existing
+
+
+def _parse_row(row):
+    """Returns (retailer_id, product_id, required_qty) or raises ValueError."""
+    if not isinstance(row, dict):
+        raise ValueError("Each order must be an object")
+    try:
+        retailer_id = int(row.get("retailer", row.get("retailer_id")))
+        product_id = int(row.get("product", row.get("product_id")))
+        required_qty = int(row.get("required_qty"))
+    except (TypeError, ValueError):
+        raise ValueError("retailer, product and required_qty must be integers")
+    if required_qty <= 0:
+        raise ValueError("required_qty must be positive")
+    return retailer_id, product_id, required_qty
+
+
+def validate_orders(rows):
+    """
+    Validates a whole upload in one pass: field checks per row, then a single
+    existence check per batch of retailer and product ids. Returns the parsed
+    rows or raises OrderValidationError with every problem found.
+    """
+    if not isinstance(rows, list) or not rows:
+        raise OrderValidationError([{"index": None, "error": "Expected a non-empty list of orders"}])
+    if len(rows) > MAX_BULK_ORDERS:
+        raise OrderValidationError([{"index": None, "error": f"At most {MAX_BULK_ORDERS} orders per request"}])
+
+    parsed, errors = [], []
+    for index, row in enumerate(rows):
+        try:
+            parsed.append((index, *_parse_row(row)))
+        except ValueError as e:
+            errors.append({"index": index, "error": str(e)})
+
+    retailers = _existing_ids(Retailer, {retailer_id for _, retailer_id, _, _ in parsed})
+    products = _existing_ids(Product, {product_id for _, _, product_id, _ in parsed})
+    for index, retailer_id, product_id, _ in parsed:
+        if retailer_id not in retailers:
+            errors.append({"index": index, "error": f"Retailer {retailer_id} does not exist"})
+        elif product_id not in products:
+            errors.append({"index": index, "error": f"Product {product_id} does not exist"})
+
+    if errors:
+        raise OrderValidationError(sorted(errors, key=lambda error: error["index"]))
+    return [row[1:] for row in parsed]
+
+
+def bulk_create_orders(rows):
+    """
+    Creates many pending orders at once, all or nothing.
+
+    The orders are inserted with bulk_create, so the per-order post_save hook
+    does not run. Instead each product gets one aggregated
+    total_required_quantity delta, and only the touched products have their
+    status refreshed. Bulk orders are not allocated one by one; the next full
+    pass (or allocation job) picks them up. Returns the created orders.
+    """
+    parsed = validate_orders(rows)
+
+    required = Counter()
+    for _, product_id, required_qty in parsed:
+        required[product_id] += required_qty
+
+    with transaction.atomic():
+        orders = Order.objects.bulk_create(
+            [
+                Order(retailer_id=retailer_id, product_id=product_id, required_qty=required_qty)
+                for retailer_id, product_id, required_qty in parsed
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        adjust_quantities(
+            {product_id: {"total_required_quantity": qty} for product_id, qty in required.items()},
+            kind="reservation", reference=f"orders {orders[0].order_id}-{orders[-1].order_id}",
+        )
+        bump(ORDERS)  # bulk_create sends no post_save
+
+    return orders
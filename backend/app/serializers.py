@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import Product, Category, Retailer, Order,  Employee, Truck, Shipment
+from .models import Product, Category, Retailer, Order,  Employee, Truck, Shipment, AllocationJob, CategoryStockSummary, StockAlert
+from django.db import transaction
+from .delivery import update_shipment_statuses
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -43,28 +45,41 @@ class ShipmentSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         """
-        When status is updated to 'delivered', update:
-        - The order's status
-        - The product's total_required_quantity and total_shipped
+        Status changes go through the delivery service, which updates the order,
+        the product counters and the truck in the same transaction.
         """
-        if "status" in validated_data and validated_data["status"] == "delivered":
-            order = instance.order
-            product = order.product
-
-            # Update order status
-            order.status = "delivered"
-            order.save(update_fields=["status"])
-
-            # Update product details
-            product.total_required_quantity = max(0, product.total_required_quantity - order.required_qty)
-            product.total_shipped += order.required_qty
-            product.save(update_fields=["total_required_quantity", "total_shipped"])
-
-        return super().update(instance, validated_data)
+        new_status = validated_data.pop("status", None)
+        with transaction.atomic():
+            if new_status is not None and new_status != instance.status:
+                update_shipment_statuses({instance.shipment_id: new_status})
+                instance.refresh_from_db(fields=["status"])
+            return super().update(instance, validated_data)
     
 class CategorySerializer(serializers.ModelSerializer):
     product_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Category
-        fields = ['category_id', 'name', 'product_count']
\ No newline at end of file
+        fields = ['category_id', 'name', 'product_count']
+
+class AllocationJobSerializer(serializers.ModelSerializer):
+    duration_ms = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = AllocationJob
+        fields = '__all__'
+
+class CategoryStockSummarySerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source='category.name')
+
+    class Meta:
+        model = CategoryStockSummary
+        fields = ['category', 'name', 'product_count', 'on_demand_count', 'available_quantity',
+                  'total_required_quantity', 'total_shipped', 'updated_at']
+
+class StockAlertSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+
+    class Meta:
+        model = StockAlert
+        fields = '__all__'
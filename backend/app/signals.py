@@ -1,35 +1,39 @@
-from django.db.models.signals import post_save, post_delete, pre_save
-from django.db.models import F
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import Sum
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from django.contrib.auth.models import User, Group
-from .models import Order, Product, Shipment, Truck, Employee
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth.models import User
+from .models import Category, Order, Product, Retailer, Shipment, Employee, StockAlertRule, Truck
+from . import cache
+from .alerts import evaluate_stock_alerts
+from .allocation import adjust_truck_loads, allocate_order, schedule_incremental_allocation
+from .delivery import apply_transitions, Transition
+from .employees import EMPLOYEE_GROUP, is_employee_group, provision_employee, provision_employees
+from .stock import adjust_quantities, apply_summary_deltas, record_movements, QUANTITY_FIELDS, SUMMARY_FIELDS
 
 
 # ===================== EMPLOYEE SIGNAL =====================
 
-@receiver(post_save, sender=User)
-def create_employee_for_user(sender, instance, created, **kwargs):
-    """Automatically create Employee when a user is added to the 'Employee' group."""
-    if created and instance.groups.filter(name="Employee").exists():
-        truck = Truck.objects.filter(is_available=True).first()
-        if truck:
-            truck.is_available = False  
-            truck.save()
-        Employee.objects.create(user=instance, contact="Not Provided", truck=truck)
-
-
-@receiver(post_save, sender=User)
-def update_employee_for_user(sender, instance, **kwargs):
-    """Ensure Employee model is updated when user is added to Employee group."""
-    if instance.groups.filter(name="Employee").exists():
-        employee, created = Employee.objects.get_or_create(user=instance)
-        if created or not employee.truck:
-            truck = Truck.objects.filter(is_available=True).first()
-            if truck:
-                truck.is_available = False
-                truck.save()
-                employee.truck = truck
-            employee.save()
+@receiver(m2m_changed, sender=User.groups.through)
+def provision_employees_on_group_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Provisions an Employee (and truck) when a user joins the employee group.
+
+    Driven by group membership only, so ordinary User saves (e.g. the
+    last_login update on every login) cost no extra queries.
+    """
+    if action != "post_add" or not pk_set:
+        return
+
+    if not reverse:
+        # user.groups.add(...): instance is the user, pk_set the groups
+        if is_employee_group(pk_set):
+            provision_employee(instance)
+    elif instance.name.lower() == EMPLOYEE_GROUP:
+        # group.user_set.add(...): instance is the group, pk_set the users
+        provision_employees(User.objects.filter(pk__in=pk_set))
 
 
 @receiver(post_delete, sender=Employee)
@@ -40,73 +44,188 @@ def make_truck_available(sender, instance, **kwargs):
         instance.truck.save()
 
 
-# ===================== ORDER SIGNALS =====================
+# ===================== PRODUCT SIGNALS =====================
+
+@receiver(post_save, sender=Product)
+def record_product_counter_changes(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Keeps the stock ledger complete for counters written through Product.save()
+    (new products, admin edits); adjust_quantities records its own movements.
+    """
+    if created:
+        changes = {field: getattr(instance, field) for field in QUANTITY_FIELDS}
+        record_movements({instance.product_id: changes}, "receipt", "new product")
+    else:
+        saved = set(update_fields or QUANTITY_FIELDS) - instance.get_deferred_fields()
+        changes = {
+            field: getattr(instance, field) - (instance.previous_value(field) or 0)
+            for field in QUANTITY_FIELDS if field in saved and instance.has_changed(field)
+        }
+        record_movements({instance.product_id: changes}, "adjustment", "product edit")
+
+
+def _add_to_summary(deltas, category_id, status, quantities, sign=1):
+    """Adds (or with ``sign=-1`` takes away) one product's share of its category summary to ``deltas``."""
+    summary = deltas.setdefault(category_id, dict.fromkeys(SUMMARY_FIELDS, 0))
+    summary["product_count"] += sign
+    summary["on_demand_count"] += sign * (status == 'on_demand')
+    for field, value in quantities.items():
+        summary[field] += sign * (value or 0)
+
+
+@receiver(post_save, sender=Product)
+def refresh_category_summary_on_product_save(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Products saved one at a time (new products, admin edits) move their
+    category summaries by their own old and new values (see
+    apply_summary_deltas) and re-evaluate their alerts. Fields the save did
+    not write keep their previous values.
+    """
+    fields = QUANTITY_FIELDS + ('status', 'category_id')
+    unsaved = set(instance.get_deferred_fields())
+    if update_fields is not None:
+        unsaved |= set(fields) - {Product._meta.get_field(name).attname for name in update_fields}
+
+    def saved(field):
+        return instance.previous_value(field) if field in unsaved else getattr(instance, field)
+
+    if not created and not any(saved(field) != instance.previous_value(field) for field in fields):
+        return
+
+    deltas = {}
+    if not created:
+        _add_to_summary(
+            deltas, instance.previous_value('category_id'), instance.previous_value('status'),
+            {field: instance.previous_value(field) for field in QUANTITY_FIELDS}, sign=-1,
+        )
+    _add_to_summary(deltas, saved('category_id'), saved('status'), {field: saved(field) for field in QUANTITY_FIELDS})
+    apply_summary_deltas(deltas)
+    evaluate_stock_alerts([instance.product_id])
+
+
+@receiver(post_delete, sender=Product)
+def refresh_category_summary_on_product_delete(sender, instance, **kwargs):
+    # After commit: when a whole category is being deleted its summary goes with it
+    deltas = {}
+    _add_to_summary(
+        deltas, instance.category_id, instance.status, {field: getattr(instance, field) for field in QUANTITY_FIELDS}, sign=-1,
+    )
+    transaction.on_commit(lambda: apply_summary_deltas(deltas))
 
-@receiver(pre_save, sender=Order)
-def store_old_order_status(sender, instance, **kwargs):
-    """Stores the old order status and quantity before saving."""
-    try:
-        old_order = Order.objects.get(pk=instance.pk)
-        instance._old_status = old_order.status
-        instance._old_required_qty = old_order.required_qty
-    except Order.DoesNotExist:
-        instance._old_status = None
-        instance._old_required_qty = None
 
+@receiver(post_save, sender=StockAlertRule)
+def evaluate_new_stock_alert_rule(sender, instance, **kwargs):
+    """A new or edited rule is checked against its products straight away."""
+    if not instance.is_active:
+        instance.alerts.filter(resolved_at__isnull=True).update(resolved_at=timezone.now())
+    elif instance.product_id:
+        evaluate_stock_alerts([instance.product_id])
+    else:
+        evaluate_stock_alerts(Product.objects.filter(category_id=instance.category_id).values_list('product_id', flat=True))
+
+
+# ===================== ORDER SIGNALS =====================
 
 @receiver(post_save, sender=Order)
 def update_product_required_quantity_on_save(sender, instance, created, **kwargs):
-    """Updates total_required_quantity and product status when an Order is created or updated."""
+    """
+    Updates total_required_quantity and product status when an Order is created or updated.
 
-    product_qs = Product.objects.filter(product_id=instance.product.product_id)
+    The previous status, quantity and product come from the values tracked when
+    the order was loaded (see TrackedFieldsMixin). Delivered shipments already
+    took their quantity off the requirement (see app/delivery.py), so they are
+    only read when the order is closed, reopened or moved to another product.
+    """
 
-    if created:
-        # Order is created, update total_required_quantity and refresh product
-        if instance.status in ['pending', 'allocated']:
-            product_qs.update(total_required_quantity=F('total_required_quantity') + instance.required_qty)
-        
-        # Refresh product instance only on creation
-        product = Product.objects.get(product_id=instance.product.product_id)
-    else:
-        # Order is updated, work with existing product data
-        product = instance.product
-        old_status = instance._old_status
-        old_required_qty = instance._old_required_qty
+    open_statuses = ['pending', 'allocated']
+    was_open = not created and instance.previous_value('status') in open_statuses
+    is_open = instance.status in open_statuses
+    old_product_id = instance.previous_value('product_id')
+    changes = {}
 
-        if old_status in ['pending', 'allocated'] and instance.status in ['delivered', 'cancelled']:
-            product_qs.update(total_required_quantity=F('total_required_quantity') - old_required_qty)
+    delivered = 0
+    if not created and (was_open != is_open or old_product_id != instance.product_id):
+        delivered = instance.shipments.filter(status='delivered').aggregate(total=Sum('quantity'))['total'] or 0
 
-        elif old_status in ['delivered', 'cancelled'] and instance.status in ['pending', 'allocated']:
-            product_qs.update(total_required_quantity=F('total_required_quantity') + instance.required_qty)
+    # An open order counts towards its product's requirement with what is not
+    # delivered yet: take the old contribution away and add the new one
+    if was_open:
+        changes[old_product_id] = delivered - instance.previous_value('required_qty')
 
-        elif old_status in ['pending', 'allocated'] and instance.status in ['pending', 'allocated']:
-            quantity_difference = instance.required_qty - old_required_qty
-            product_qs.update(total_required_quantity=F('total_required_quantity') + quantity_difference)
+    if is_open:
+        changes[instance.product_id] = changes.get(instance.product_id, 0) + instance.required_qty - delivered
 
-    # Update product status
-    product_qs.update(
-        status="on_demand" if product.total_required_quantity > product.available_quantity else "sufficient"
-    )
+    # Update total_required_quantity and product status
+    changes = {product_id: delta for product_id, delta in changes.items() if delta}
+    if changes:
+        kind = {'cancelled': 'cancellation', 'delivered': 'delivery'}.get(instance.status, 'reservation')
+        adjust_quantities(
+            {product_id: {"total_required_quantity": delta} for product_id, delta in changes.items()},
+            kind=kind, reference=f"order {instance.order_id}",
+        )
+
+    # Place a new order straight away instead of waiting for the next full pass
+    if created and instance.status == 'pending':
+        schedule_incremental_allocation(allocate_order, instance.order_id)
 
 
 
 # ===================== SHIPMENT SIGNALS =====================
 
 @receiver(post_save, sender=Shipment)
-def update_truck_availability_on_shipment(sender, instance, created, **kwargs):
-    truck = getattr(instance.employee, 'truck', None)
-
-    if truck:
-        if created and instance.status == 'in_transit':
-            truck.is_available = False
-        elif instance.status == 'delivered':
-            all_delivered = not Shipment.objects.filter(employee=instance.employee, status='in_transit').exists()
-            if all_delivered:
-                truck.is_available = True
-        truck.save()
-
-    # ✅ Ensure product's total_required_quantity never goes negative
-    if instance.status == "delivered":
-        product = instance.order.product
-        product.update_status()
-        product.save(update_fields=["total_required_quantity", "total_shipped", "status"])
\ No newline at end of file
+def apply_shipment_status_change(sender, instance, created, **kwargs):
+    """
+    Shipments saved one at a time (e.g. from the admin) get the same order,
+    product and truck bookkeeping as the delivery service. An in-transit
+    shipment moved to another employee or resized moves its load with it.
+    """
+    if created:
+        if instance.status == 'in_transit':
+            adjust_truck_loads({instance.employee_id: (1, instance.quantity)})
+        return
+
+    old_status = instance.previous_value('status')
+    if old_status == 'in_transit' and (instance.has_changed('employee_id') or instance.has_changed('quantity')):
+        # Carry the load over first; a status change below then unloads the new truck
+        loads = {instance.previous_value('employee_id'): (-1, -instance.previous_value('quantity'))}
+        count, quantity = loads.get(instance.employee_id, (0, 0))
+        loads[instance.employee_id] = (count + 1, quantity + instance.quantity)
+        adjust_truck_loads(loads)
+
+    if old_status != instance.status:
+        apply_transitions([Transition(
+            instance.shipment_id, instance.order_id, instance.order.product_id, instance.employee_id,
+            instance.quantity, old_status, instance.status,
+        )])
+
+
+@receiver(post_delete, sender=Shipment)
+def unload_truck_on_shipment_delete(sender, instance, **kwargs):
+    """A deleted in-transit shipment no longer takes up room on its truck."""
+    if instance.status == 'in_transit':
+        adjust_truck_loads({instance.employee_id: (-1, -instance.quantity)})
+
+
+# ===================== CACHE SIGNALS =====================
+
+# Which cached dashboard data each model feeds (see app/cache.py); bulk writes bump explicitly
+CACHED_MODELS = {
+    Order: cache.ORDERS,
+    Shipment: cache.SHIPMENTS,
+    Product: cache.PRODUCTS,
+    Category: cache.CATEGORIES,
+    Employee: cache.EMPLOYEES,
+    Retailer: cache.RETAILERS,
+    Truck: cache.TRUCKS,
+    LogEntry: cache.ADMIN_LOG,
+}
+
+
+def invalidate_cached_responses(sender, **kwargs):
+    cache.bump(CACHED_MODELS[sender])
+
+
+for model in CACHED_MODELS:
+    post_save.connect(invalidate_cached_responses, sender=model, dispatch_uid=f"cache_{model.__name__}_save")
+    post_delete.connect(invalidate_cached_responses, sender=model, dispatch_uid=f"cache_{model.__name__}_delete")
+
@@ -0,0 +1,254 @@
+from django.db import transaction
+from django.db.models import Case, CharField, Count, F, IntegerField, Max, Min, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from .cache import bump, PRODUCTS
+from .models import Category, CategoryStockSummary, Order, Product, Shipment, StockMovement
+
+QUANTITY_FIELDS = ("available_quantity", "total_required_quantity", "total_shipped")
+# Counter -> StockMovement column holding its delta
+MOVEMENT_FIELDS = {
+    "available_quantity": "available_delta",
+    "total_required_quantity": "required_delta",
+    "total_shipped": "shipped_delta",
+}
+SUMMARY_FIELDS = ["product_count", "on_demand_count", "available_quantity", "total_required_quantity", "total_shipped"]
+# Summary columns that follow counter changes (product_count only changes when products are added or removed)
+SUMMARY_DELTA_FIELDS = ["on_demand_count", *QUANTITY_FIELDS]
+BATCH_SIZE = 1000
+
+
+def batches(items, size=BATCH_SIZE):
+    """Yields lists of at most ``size`` items, to keep IN lists and CASE statements bounded."""
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def refresh_product_status(product_ids, summaries=True):
+    """
+    Recomputes Product.status for the given products only.
+
+    One conditional UPDATE ... CASE per batch of ids, touching only the rows whose
+    status actually changes. Unless ``summaries`` is False, the rows about to
+    change are read (and locked) first, so their categories' on_demand_count
+    can be adjusted by the difference. Returns the number of rows changed.
+    """
+    changed = 0
+    summary_deltas = {}
+    with transaction.atomic():
+        for batch in batches(sorted(set(product_ids))):
+            status = Product.status_expression()
+            stale = Product.objects.filter(product_id__in=batch).exclude(status=status)
+            if summaries:
+                rows = stale.select_for_update().order_by("product_id").values_list("category_id", "status")
+                for category_id, old_status in rows:
+                    summary = summary_deltas.setdefault(category_id, dict.fromkeys(SUMMARY_DELTA_FIELDS, 0))
+                    summary["on_demand_count"] += -1 if old_status == "on_demand" else 1
+            changed += stale.update(status=status)
+        apply_summary_deltas(summary_deltas)
+    return changed
+
+
+def refresh_category_summaries(product_ids=(), category_ids=()):
+    """
+    Recomputes the CategoryStockSummary rows of the given categories and of the
+    categories of the given products; the rest of the table is left alone.
+
+    Per batch: one aggregate over the products of those categories (joined on
+    the category index) and one upsert, so the cost follows the size of the
+    categories touched, not of the catalogue. Categories that no longer exist
+    are skipped.
+    """
+    for batch in batches(set(product_ids)):
+        _refresh_summaries(Product.objects.filter(product_id__in=batch).values("category_id"))
+    for batch in batches(set(category_ids)):
+        _refresh_summaries(batch)
+
+
+def _refresh_summaries(category_ids):
+    # LEFT JOIN, so categories left without products drop to zero
+    rows = Category.objects.filter(category_id__in=category_ids).values("category_id").annotate(
+        product_count=Count("products"),
+        on_demand_count=Count("products", filter=Q(products__status="on_demand")),
+        available_quantity=Coalesce(Sum("products__available_quantity"), 0),
+        total_required_quantity=Coalesce(Sum("products__total_required_quantity"), 0),
+        total_shipped=Coalesce(Sum("products__total_shipped"), 0),
+    )
+    CategoryStockSummary.objects.bulk_create(
+        [CategoryStockSummary(**row) for row in rows],
+        update_conflicts=True,
+        unique_fields=["category"],
+        update_fields=SUMMARY_FIELDS + ["updated_at"],
+    )
+
+
+def apply_summary_deltas(deltas):
+    """
+    Adds per-category deltas (category_id -> {field: delta} over
+    SUMMARY_FIELDS, missing fields count as 0) to the CategoryStockSummary
+    rows, one CASE-based UPDATE per batch of categories, so a write costs the
+    same whatever the size of its category. Categories without a summary row
+    yet get a full one.
+    refresh_category_summaries remains the rebuild from the products, used by
+    the reconcile_product_counters command.
+    """
+    deltas = {category_id: fields for category_id, fields in deltas.items() if any(fields.values())}
+    for batch in batches(deltas):
+        updates = {}
+        for field in SUMMARY_FIELDS:
+            amounts = {category_id: deltas[category_id].get(field, 0) for category_id in batch}
+            amounts = {category_id: amount for category_id, amount in amounts.items() if amount}
+            if amounts:
+                delta = Case(
+                    *[When(category_id=category_id, then=Value(amount)) for category_id, amount in amounts.items()],
+                    default=Value(0), output_field=IntegerField(),
+                )
+                updates[field] = Greatest(F(field) + delta, Value(0))
+
+        updated = CategoryStockSummary.objects.filter(category_id__in=batch).update(**updates, updated_at=timezone.now())
+        if updated < len(batch):
+            existing = set(CategoryStockSummary.objects.filter(category_id__in=batch).values_list("category_id", flat=True))
+            _refresh_summaries([category_id for category_id in batch if category_id not in existing])
+
+
+def record_movements(changes, kind, reference=""):
+    """
+    Appends one StockMovement per product to the ledger. Plain INSERTs; the
+    caller serializes writers to the same product through its row lock on the
+    counters (see adjust_quantities).
+    """
+    StockMovement.objects.bulk_create([
+        StockMovement(
+            product_id=product_id, kind=kind, reference=reference,
+            **{MOVEMENT_FIELDS[field]: delta for field, delta in deltas.items()},
+        )
+        for product_id, deltas in changes.items()
+        if any(deltas.values())
+    ], batch_size=BATCH_SIZE)
+
+
+def record_opening_balances(product_ids, reference=""):
+    """Records the current counters of products written without the ledger (e.g. by bulk_create) as receipts."""
+    for batch in batches(set(product_ids)):
+        rows = Product.objects.filter(product_id__in=batch).values_list("product_id", *QUANTITY_FIELDS)
+        record_movements(
+            {product_id: dict(zip(QUANTITY_FIELDS, counters)) for product_id, *counters in rows},
+            "receipt", reference,
+        )
+
+
+def adjust_quantities(changes, guard=False, kind="adjustment", reference=""):
+    """
+    Applies signed per-product counter deltas, records them in the stock ledger
+    as ``kind`` movements and refreshes the affected statuses.
+
+    ``changes`` maps product_id -> {field: delta} for fields in QUANTITY_FIELDS.
+    Each batch of products costs one locking read of their counters, one
+    CASE-based UPDATE writing the new counters and statuses and one ledger
+    INSERT, then one UPDATE applying the same deltas to the category summaries
+    involved (see apply_summary_deltas) and an evaluation of their stock alert
+    rules.
+    Without ``guard`` counters are clamped at zero. With ``guard`` a product is
+    only updated if none of its counters would go negative, and the caller can
+    compare the returned row count with len(changes) to detect a shortfall.
+    Either way the ledger records the deltas actually applied, so it always
+    adds up to the counters. The counters stay the write path (the guard, the
+    clamp and the statuses need the current values), so concurrent writers to
+    the same product queue on its row lock; writers to other products do not.
+    """
+    changes = {product_id: deltas for product_id, deltas in changes.items() if any(deltas.values())}
+    applied = {}
+    summary_deltas = {}
+
+    with transaction.atomic():
+        # Rows are locked in id order, so concurrent writers cannot deadlock here
+        for batch in batches(sorted(changes)):
+            rows = (
+                Product.objects.select_for_update().filter(product_id__in=batch)
+                .order_by("product_id").values_list("product_id", "category_id", "status", *QUANTITY_FIELDS)
+            )
+            counters = {}
+            for product_id, category_id, old_status, *values in rows:
+                old = dict(zip(QUANTITY_FIELDS, values))
+                new = {field: old[field] + changes[product_id].get(field, 0) for field in QUANTITY_FIELDS}
+                if guard and any(value < 0 for value in new.values()):
+                    continue
+                new = {field: max(value, 0) for field, value in new.items()}
+                new["status"] = Product.status_for(new["available_quantity"], new["total_required_quantity"])
+                counters[product_id] = new
+                applied[product_id] = {field: new[field] - old[field] for field in QUANTITY_FIELDS}
+
+                summary = summary_deltas.setdefault(category_id, dict.fromkeys(SUMMARY_DELTA_FIELDS, 0))
+                for field, delta in applied[product_id].items():
+                    summary[field] += delta
+                summary["on_demand_count"] += (new["status"] == "on_demand") - (old_status == "on_demand")
+
+            if counters:
+                updates = {
+                    field: Case(
+                        *[When(product_id=product_id, then=Value(new[field])) for product_id, new in counters.items()],
+                        default=F(field), output_field=IntegerField(),
+                    )
+                    for field in QUANTITY_FIELDS if any(applied[product_id][field] for product_id in counters)
+                }
+                updates["status"] = Case(
+                    *[When(product_id=product_id, then=Value(new["status"])) for product_id, new in counters.items()],
+                    default=F("status"), output_field=CharField(),
+                )
+                Product.objects.filter(product_id__in=counters).update(**updates)
+
+        record_movements(applied, kind, reference)
+        apply_summary_deltas(summary_deltas)
+
+        from .alerts import evaluate_stock_alerts
+        evaluate_stock_alerts(applied)
+    bump(PRODUCTS)
+    return len(applied)
+
+
+def _grouped(queryset, key, field):
+    return dict(queryset.order_by().values(key).annotate(total=Sum(field)).values_list(key, "total"))
+
+
+def iter_counter_drift(chunk_size=BATCH_SIZE):
+    """
+    Recomputes total_required_quantity and total_shipped from orders and
+    shipments, one product-id range at a time, and yields
+    (products_checked, drift) per range, where drift maps
+    product_id -> {field: (recorded, actual)} for the counters that differ.
+
+    The true values follow the write paths: an open order requires what has
+    not been delivered yet, and delivered shipments count as shipped. Each
+    range costs four grouped queries and keeps only its own totals in memory,
+    however many orders there are.
+    """
+    bounds = Product.objects.aggregate(low=Min("product_id"), high=Max("product_id"))
+    if bounds["low"] is None:
+        return
+
+    for start in range(bounds["low"], bounds["high"] + 1, chunk_size):
+        in_range = {"product_id__gte": start, "product_id__lt": start + chunk_size}
+        shipments_in_range = {"order__product_id__gte": start, "order__product_id__lt": start + chunk_size}
+        delivered = Shipment.objects.filter(status="delivered", **shipments_in_range)
+
+        required = _grouped(Order.objects.filter(status__in=["pending", "allocated"], **in_range), "product_id", "required_qty")
+        delivered_open = _grouped(delivered.filter(order__status__in=["pending", "allocated"]), "order__product_id", "quantity")
+        shipped = _grouped(delivered, "order__product_id", "quantity")
+
+        checked = 0
+        drift = {}
+        for product_id, *recorded in Product.objects.filter(**in_range).values_list("product_id", "total_required_quantity", "total_shipped"):
+            checked += 1
+            actual = (
+                max(0, (required.get(product_id) or 0) - (delivered_open.get(product_id) or 0)),
+                shipped.get(product_id) or 0,
+            )
+            fields = {
+                field: (was, should_be)
+                for field, was, should_be in zip(("total_required_quantity", "total_shipped"), recorded, actual)
+                if was != should_be
+            }
+            if fields:
+                drift[product_id] = fields
+        yield checked, drift
@@ -1,3 +1,1261 @@
-from django.test import TestCase
+import re
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+import numpy as np
+from django.contrib.auth.models import Group, User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.models import Count, F, Q
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from app.models import (
+    AllocationJob, Category, CategoryStockSummary, Employee, Order, Product, ProductForecast, Retailer, Shipment,
+    ResourceVersion, StockAlert, StockAlertRule, StockMovement, Truck,
+)
+from app import allocation, cache
+from app.alerts import evaluate_stock_alerts
+from app.allocation import Allocation, PendingOrder, TruckSlot
+from app.dashboard import KPIS, dashboard_stats, register_kpi
+from app.delivery import DeliveryError, update_shipment_statuses
+from app.forecasting import forecast, load_daily_demand, update_forecasts
+from app.jobs import claim_next_job, fail_stale_jobs, run_job, submit_allocation_job
+from app.ledger import compact, stock_at
+from app.stock import QUANTITY_FIELDS, SUMMARY_FIELDS, adjust_quantities, refresh_product_status
 
-# Create your tests here.
+
+def make_product(name, available, category=None):
+    category = category or Category.objects.get_or_create(name="test-category")[0]
+    return Product.objects.create(name=name, category=category, available_quantity=available)
+
+
+def make_driver(capacity, name=None):
+    """An employee with a free truck of ``capacity``."""
+    name = name or f"driver-{Employee.objects.count() + 1}"
+    truck = Truck.objects.create(license_plate=name.upper(), capacity=capacity)
+    return Employee.objects.create(user=User.objects.create(username=name), truck=truck)
+
+
+def make_order(product, quantity, distance=5.0):
+    retailer = Retailer.objects.create(name=f"retailer-{distance}", address="-", contact="-", distance_from_warehouse=distance)
+    return Order.objects.create(retailer=retailer, product=product, required_qty=quantity)
+
+
+def pending(order_id, quantity, product_id=1, distance=5.0, age=0):
+    """A PendingOrder for in-memory planning; a higher ``age`` is an older order."""
+    return PendingOrder(order_id, product_id, quantity, distance, timezone.now() - timedelta(minutes=age))
+
+
+# Tables that grow with the business; reading one of them in full is a bug on a hot path
+HOT_TABLES = ("app_order", "app_shipment", "app_product")
+
+
+class QueryPlanTests(TestCase):
+    """
+    Runs the hot paths (views.py, allocation.py, delivery.py, signals.py),
+    captures the statements they actually send and fails if the plan of one
+    of them scans a whole hot table.
+
+    On PostgreSQL sequential scans are disabled for the test, so the planner
+    only falls back to one when no index can serve the query; on SQLite a
+    plain "SCAN <table>" (one not driven by an index) is the same signal.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="plan-category")
+        products = Product.objects.bulk_create(
+            Product(name=f"product-{i}", category=category, available_quantity=i, status="on_demand" if i % 3 else "sufficient")
+            for i in range(50)
+        )
+        retailers = Retailer.objects.bulk_create(
+            Retailer(name=f"retailer-{i}", address="-", contact="-", distance_from_warehouse=i) for i in range(10)
+        )
+        trucks = Truck.objects.bulk_create(
+            Truck(license_plate=f"PLAN-{i}", capacity=100, remaining_capacity=100) for i in range(5)
+        )
+        employees = [
+            Employee.objects.create(user=User.objects.create(username=f"plan-driver-{i}"), truck=truck)
+            for i, truck in enumerate(trucks)
+        ]
+        orders = Order.objects.bulk_create(
+            Order(retailer=retailers[i % 10], product=products[i % 50], required_qty=1 + i % 7,
+                  status=["pending", "allocated", "delivered", "cancelled"][i % 4])
+            for i in range(500)
+        )
+        Shipment.objects.bulk_create(
+            Shipment(order=order, employee=employees[i % 5], quantity=order.required_qty,
+                     status="delivered" if order.status == "delivered" else "in_transit")
+            for i, order in enumerate(orders) if order.status in ("allocated", "delivered")
+        )
+        cls.product = products[7]
+        cls.employee = employees[2]
+        cls.order = orders[5]
+
+    def setUp(self):
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username="plan-admin", is_staff=True))
+
+    def explain(self, sql):
+        prefix = "EXPLAIN " if connection.vendor == "postgresql" else "EXPLAIN QUERY PLAN "
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql)
+            return "\n".join(str(row[-1]) for row in cursor.fetchall())
+
+    def full_scans(self, plan):
+        if connection.vendor == "postgresql":
+            scans = re.findall(r"Seq Scan on (\w+)", plan)
+        else:
+            scans = re.findall(r"\bSCAN (\w+)\b(?! USING)", plan)
+        return [table for table in scans if table in HOT_TABLES]
+
+    def assertNoFullScan(self, queries):
+        """EXPLAINs every statement captured in ``queries`` that reads a hot table."""
+        explained = 0
+        for query in queries:
+            sql = query["sql"]
+            if not sql.startswith(("SELECT", "UPDATE", "DELETE")) or not any(f'"{table}"' in sql for table in HOT_TABLES):
+                continue
+            plan = self.explain(sql)
+            explained += 1
+            scans = self.full_scans(plan)
+            self.assertFalse(scans, f"Full scan of {', '.join(scans)}:\n{sql}\n{plan}")
+        self.assertTrue(explained, "No statement on a hot table was captured")
+
+    def test_orders_list(self):
+        # get_orders: first page, a later keyset page, filtered by status
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get("/api/orders/").data
+            self.client.get(first["next"])
+            self.client.get("/api/orders/", {"status": "allocated"})
+        self.assertNoFullScan(queries)
+
+    @override_settings(INCREMENTAL_ALLOCATION=False)
+    def test_pending_backlog(self):
+        # allocation.load_pending_orders chunk by chunk, and the plan it commits
+        with CaptureQueriesContext(connection) as queries:
+            allocation.run_allocation(chunk_size=20)
+        self.assertNoFullScan(queries)
+
+    def test_shipments(self):
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get("/api/shipments/").data
+            self.client.get(first["next"])
+        self.assertNoFullScan(queries)
+
+    @override_settings(INCREMENTAL_ALLOCATION=False)
+    def test_delivery_and_order_updates(self):
+        # update_shipment_statuses and the Order post_save hook reading delivered shipments
+        shipment = Shipment.objects.filter(employee=self.employee, status="in_transit").first()
+        with CaptureQueriesContext(connection) as queries:
+            update_shipment_statuses({shipment.pk: "delivered"})
+            order = Order.objects.get(pk=self.order.pk)
+            order.status = "cancelled"
+            order.save()
+        self.assertNoFullScan(queries)
+
+    def test_products(self):
+        # store_qr_code's get_or_create lookup and stock increment
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post("/api/store_qr/", {
+                "qr_text": f"name={self.product.name}|category={self.product.category.name}|quantity=3",
+            })
+        self.assertNoFullScan(queries)
+
+    def test_dashboard_reads_each_table_once(self):
+        # Global KPIs are whole-table aggregates: one pass per table, never one per figure
+        with CaptureQueriesContext(connection) as queries:
+            dashboard_stats()
+        plan = self.explain(queries[-1]["sql"])
+        if connection.vendor == "postgresql":
+            reads = re.findall(r"(?:Seq|Index Only|Index|Bitmap Heap) Scan (?:using \w+ )?on (\w+)", plan)
+        else:
+            reads = re.findall(r"\bSCAN (\w+)\b", plan)
+        self.assertEqual(sorted(table for table in reads if table in HOT_TABLES), sorted(HOT_TABLES), plan)
+
+
+@override_settings(INCREMENTAL_ALLOCATION=False)
+class AllocationEngineTests(TestCase):
+    def test_best_fit_decreasing_packs_largest_orders_first(self):
+        orders = [pending(1, 4, age=3), pending(2, 4, age=2), pending(3, 6, age=1)]
+        trucks = [TruckSlot(1, 1, 10), TruckSlot(2, 2, 4)]
+
+        allocations, skipped = allocation.get_strategy("best_fit_decreasing").plan(orders, trucks, {1: 100})
+
+        self.assertEqual(skipped, [])
+        self.assertEqual(sorted(a.quantity for a in allocations if a.employee_id == 1), [4, 6])
+        self.assertEqual([a.quantity for a in allocations if a.employee_id == 2], [4])
+
+    def test_orders_short_of_stock_are_skipped(self):
+        allocations, skipped = allocation.get_strategy().plan([pending(1, 5), pending(2, 3)], [TruckSlot(1, 1, 10)], {1: 4})
+
+        self.assertEqual(allocations, [Allocation(2, 1, 1, 3)])
+        self.assertEqual(skipped, [{"order_id": 1, "reason": allocation.INSUFFICIENT_STOCK}])
+
+    def test_unknown_strategy_is_rejected(self):
+        with self.assertRaises(ValueError):
+            allocation.get_strategy("nope")
+
+    def test_run_allocation_creates_shipments_and_takes_stock(self):
+        product = make_product("widget", 10)
+        driver = make_driver(20)
+        placed = make_order(product, 6)
+        short = make_order(product, 5)
+
+        result = allocation.run_allocation()
+
+        self.assertEqual([row["order_id"] for row in result["allocated_orders"]], [placed.order_id])
+        self.assertEqual(result["skipped_orders"], [{"order_id": short.order_id, "reason": allocation.INSUFFICIENT_STOCK}])
+        shipment = Shipment.objects.get()
+        self.assertEqual((shipment.order_id, shipment.employee_id, shipment.quantity), (placed.order_id, driver.employee_id, 6))
+        placed.refresh_from_db()
+        product.refresh_from_db()
+        self.assertEqual(placed.status, "allocated")
+        self.assertEqual(product.available_quantity, 4)
+
+
+
+@override_settings(INCREMENTAL_ALLOCATION=False)
+class CommitPlanTests(TestCase):
+    def commit(self, count):
+        product = make_product(f"bulk-{count}", 1000)
+        driver = make_driver(1000)
+        orders = [make_order(product, 2) for _ in range(count)]
+        # The last order only gets half of its quantity
+        allocations = [Allocation(order.order_id, product.product_id, driver.employee_id, 2) for order in orders[:-1]]
+        allocations.append(Allocation(orders[-1].order_id, product.product_id, driver.employee_id, 1))
+        outstanding = {order.order_id: 2 for order in orders}
+
+        with CaptureQueriesContext(connection) as queries:
+            shipment_ids = allocation.commit_plan(allocations, outstanding)
+        return orders, shipment_ids, len(queries)
+
+    def test_statement_count_does_not_grow_with_the_plan(self):
+        _, _, few = self.commit(3)
+        _, _, many = self.commit(40)
+        self.assertEqual(few, many)
+
+    def test_orders_are_marked_allocated_or_partially_allocated(self):
+        orders, shipment_ids, _ = self.commit(3)
+
+        self.assertEqual(len(shipment_ids), 3)
+        statuses = {order.order_id: (order.status, order.allocated_qty) for order in Order.objects.filter(pk__in=[o.pk for o in orders])}
+        self.assertEqual(statuses[orders[0].order_id], ("allocated", 2))
+        self.assertEqual(statuses[orders[-1].order_id], ("pending", 1))
+        self.assertEqual(Product.objects.get(pk=orders[0].product_id).available_quantity, 1000 - 5)
+
+
+class DistanceClusteredStrategyTests(TestCase):
+    def test_each_truck_is_loaded_from_one_distance_band(self):
+        near = [pending(order_id, 3, distance=2.0 + order_id) for order_id in (1, 2, 3)]
+        far = [pending(order_id, 3, distance=40.0 + order_id) for order_id in (4, 5)]
+        trucks = [TruckSlot(1, 1, 9), TruckSlot(2, 2, 6)]
+
+        allocations, skipped = allocation.get_strategy("distance_clustered").plan(near + far, trucks, {1: 100})
+
+        self.assertEqual(skipped, [])
+        loads = {}
+        for placed in allocations:
+            loads.setdefault(placed.employee_id, set()).add(placed.order_id)
+        self.assertEqual(loads, {1: {1, 2, 3}, 2: {4, 5}})
+
+    def test_stock_is_shared_across_trucks(self):
+        orders = [pending(1, 4, distance=1.0), pending(2, 4, distance=50.0)]
+
+        allocations, skipped = allocation.get_strategy("distance_clustered").plan(
+            orders, [TruckSlot(1, 1, 4), TruckSlot(2, 2, 4)], {1: 5},
+        )
+
+        self.assertEqual(len(allocations), 1)
+        self.assertEqual(skipped[0]["reason"], allocation.INSUFFICIENT_STOCK)
+
+
+@override_settings(INCREMENTAL_ALLOCATION=True)
+class IncrementalAllocationTests(TestCase):
+    def test_new_order_is_placed_on_commit(self):
+        product = make_product("widget", 10)
+        driver = make_driver(10)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order = make_order(product, 4)
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, "allocated")
+        self.assertEqual(Shipment.objects.get().employee_id, driver.employee_id)
+
+    def test_freed_truck_is_loaded_from_the_backlog(self):
+        product = make_product("widget", 20)
+        driver = make_driver(5)
+        with self.captureOnCommitCallbacks(execute=True):
+            first = make_order(product, 5)
+            waiting = make_order(product, 3)
+        self.assertEqual(Order.objects.get(pk=waiting.pk).status, "pending")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            update_shipment_statuses({Shipment.objects.get(order=first).pk: "delivered"})
+
+        shipment = Shipment.objects.get(order=waiting)
+        self.assertEqual((shipment.employee_id, shipment.quantity), (driver.employee_id, 3))
+
+    def test_freed_truck_takes_part_of_a_larger_order(self):
+        product = make_product("widget", 20)
+        driver = make_driver(5)
+        order = make_order(product, 8)  # Not placed: no callbacks run here
+
+        allocation.allocate_for_truck(driver.employee_id)
+
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.allocated_qty), ("pending", 5))
+        self.assertEqual(Shipment.objects.get(order=order).quantity, 5)
+
+    def test_freed_truck_claims_only_the_oldest_orders_it_could_carry(self):
+        product = make_product("widget", 100)
+        driver = make_driver(3)
+        orders = [make_order(product, 1) for _ in range(6)]
+
+        with CaptureQueriesContext(connection) as queries:
+            allocation.allocate_for_truck(driver.employee_id)
+
+        backlog_read = next(query["sql"] for query in queries if 'FROM "app_order"' in query["sql"])
+        self.assertIn("LIMIT 3", backlog_read)
+        self.assertEqual(
+            sorted(Shipment.objects.values_list("order_id", flat=True)), [order.pk for order in orders[:3]],
+        )
+
+    def test_new_order_claims_only_the_trucks_it_needs(self):
+        product = make_product("widget", 100)
+        for _ in range(4):
+            make_driver(10)
+        order = make_order(product, 15)
+
+        with mock.patch.object(allocation, "load_available_trucks", wraps=allocation.load_available_trucks) as load:
+            allocation.allocate_order(order.order_id)
+
+        self.assertEqual([call.kwargs["limit"] for call in load.call_args_list], [1, 1])
+        self.assertEqual(Order.objects.get(pk=order.pk).status, "allocated")
+        self.assertEqual(Truck.objects.filter(in_transit_count=0).count(), 2)
+
+
+@override_settings(INCREMENTAL_ALLOCATION=False)
+class SimulationTests(TestCase):
+    def setUp(self):
+        self.product = make_product("widget", 10)
+        self.driver = make_driver(5)
+        self.order = make_order(self.product, 4)
+        self.big = make_order(self.product, 6)
+
+    def test_simulation_writes_nothing(self):
+        with CaptureQueriesContext(connection) as queries:
+            result = allocation.AllocationSnapshot().simulate()
+
+        self.assertTrue(all(query["sql"].lstrip().upper().startswith("SELECT") for query in queries))
+        self.assertEqual(result["summary"]["allocated"], 2)  # The big order is split over the one truck
+        self.assertFalse(Shipment.objects.exists())
+        self.assertEqual(Product.objects.get(pk=self.product.pk).available_quantity, 10)
+
+    def test_overrides_apply_to_one_scenario_only(self):
+        snapshot = allocation.AllocationSnapshot()
+
+        extra = snapshot.simulate(extra_trucks=[10])
+        plain = snapshot.simulate()
+
+        self.assertEqual(extra["summary"]["allocated_quantity"], 10)
+        self.assertEqual(extra["summary"]["trucks_available"], 2)
+        self.assertEqual(plain["summary"]["trucks_available"], 1)
+
+    def test_restock_lifts_stock_shortages(self):
+        self.big.required_qty = 12
+        self.big.save()
+        snapshot = allocation.AllocationSnapshot()
+
+        self.assertIn(self.big.order_id, [row["order_id"] for row in snapshot.simulate(extra_trucks=[20])["skipped_orders"]])
+        restocked = snapshot.simulate(extra_trucks=[20], restock={self.product.product_id: 10})
+        self.assertEqual(restocked["skipped_orders"], [])
+
+
+@override_settings(INCREMENTAL_ALLOCATION=False)
+class SplitOrderTests(TestCase):
+    def test_order_larger_than_any_truck_is_split(self):
+        trucks = [TruckSlot(1, 1, 6), TruckSlot(2, 2, 5)]
+
+        allocations, skipped = allocation.get_strategy("best_fit_decreasing").plan([pending(1, 10)], trucks, {1: 100})
+
+        self.assertEqual(skipped, [])
+        self.assertEqual(sorted(placed.quantity for placed in allocations), [4, 6])
+
+    def test_what_does_not_fit_stays_pending(self):
+        product = make_product("widget", 100)
+        make_driver(4)
+        make_driver(3)
+        order = make_order(product, 10)
+
+        result = allocation.run_allocation()
+
+        self.assertEqual(result["skipped_orders"], [
+            {"order_id": order.order_id, "reason": allocation.PARTIALLY_ALLOCATED, "unallocated_qty": 3},
+        ])
+        self.assertEqual({row["status"] for row in result["allocated_orders"]}, {"partially_allocated"})
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.allocated_qty), ("pending", 7))
+
+        # The next run only plans the remainder
+        make_driver(5)
+        allocation.run_allocation()
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.allocated_qty), ("allocated", 10))
+
+    def test_first_fit_never_splits(self):
+        orders = [pending(1, 4, age=3), pending(2, 4, age=2), pending(3, 6, age=1)]
+        trucks = [TruckSlot(1, 1, 10), TruckSlot(2, 2, 4)]
+
+        allocations, skipped = allocation.get_strategy("first_fit").plan(orders, trucks, {1: 100})
+
+        self.assertEqual([placed.order_id for placed in allocations], [1, 2])
+        self.assertEqual(skipped, [{"order_id": 3, "reason": allocation.NO_SUITABLE_TRUCK}])
+
+
+@override_settings(INCREMENTAL_ALLOCATION=False)
+class ConcurrentAllocationTests(TestCase):
+    def test_a_chunk_claims_no_more_trucks_than_it_has_orders(self):
+        product = make_product("widget", 100)
+        for _ in range(4):
+            make_driver(10)
+        make_order(product, 2)
+
+        pending_orders, _, _, _, trucks = allocation._claim_chunk(allocation.get_strategy(), {}, None, chunk_size=10)
+
+        self.assertEqual(len(pending_orders), 1)
+        self.assertEqual(len(trucks), 1)
+
+    def test_run_without_free_trucks_stops_cleanly(self):
+        product = make_product("widget", 100)
+        order = make_order(product, 2)
+
+        result = allocation.run_allocation()
+
+        self.assertEqual(result["allocated_orders"], [])
+        self.assertEqual(result["skipped_orders"], [{"order_id": order.order_id, "reason": allocation.NO_SUITABLE_TRUCK}])
+
+    def test_guarded_decrement_detects_stock_sold_elsewhere(self):
+        product = make_product("widget", 3)
+        driver = make_driver(10)
+        order = make_order(product, 5)
+
+        with self.assertRaises(allocation.StockConflict):
+            allocation.commit_plan([Allocation(order.order_id, product.product_id, driver.employee_id, 5)], {order.order_id: 5})
+
+    def test_conflicting_chunk_is_rolled_back_and_planned_again(self):
+        product = make_product("widget", 10)
+        make_driver(10)
+        order = make_order(product, 4)
+        commit_plan = allocation.commit_plan
+        attempts = []
+
+        def conflict_once(*args, **kwargs):
+            attempts.append(1)
+            shipment_ids = commit_plan(*args, **kwargs)
+            if len(attempts) == 1:
+                raise allocation.StockConflict("sold elsewhere")
+            return shipment_ids
+
+        with mock.patch.object(allocation, "commit_plan", conflict_once):
+            result = allocation.run_allocation()
+
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual([row["order_id"] for row in result["allocated_orders"]], [order.order_id])
+        self.assertEqual(Shipment.objects.count(), 1)
+        self.assertEqual(Product.objects.get(pk=product.pk).available_quantity, 6)
+
+    def test_run_gives_up_when_stock_keeps_changing(self):
+        product = make_product("widget", 10)
+        make_driver(10)
+        make_order(product, 4)
+
+        with mock.patch.object(allocation, "commit_plan", side_effect=allocation.StockConflict("sold elsewhere")):
+            with self.assertRaises(allocation.AllocationError):
+                allocation.run_allocation()
+        self.assertFalse(Shipment.objects.exists())
+
+
+class SeedAndBenchmarkCommandTests(TestCase):
+    def seed(self, **kwargs):
+        options = {"categories": 2, "products": 10, "retailers": 5, "trucks": 3, "orders": 40, **kwargs}
+        call_command("seed_data", stdout=StringIO(), **options)
+
+    def test_seed_is_reproducible_and_clear_replaces_it(self):
+        self.seed()
+        first = list(Order.objects.order_by("order_id").values_list("product__name", "required_qty"))
+        self.seed(clear=True)
+        second = list(Order.objects.order_by("order_id").values_list("product__name", "required_qty"))
+
+        self.assertEqual(first, second)
+        self.assertEqual(Product.objects.count(), 10)
+        self.assertEqual(Employee.objects.filter(truck__isnull=False).count(), 3)
+
+    def test_seeded_counters_match_the_orders(self):
+        self.seed()
+        for product in Product.objects.all():
+            required = sum(Order.objects.filter(product=product, status__in=["pending", "allocated"]).values_list("required_qty", flat=True))
+            self.assertEqual(product.total_required_quantity, required)
+            self.assertEqual(product.status, "sufficient" if product.available_quantity > required else "on_demand")
+
+    def test_benchmark_rolls_back_unless_kept(self):
+        self.seed()
+        out = StringIO()
+
+        call_command("benchmark_allocation", "--json", stdout=out)
+
+        self.assertEqual(len(out.getvalue().splitlines()), len(allocation.STRATEGIES))
+        self.assertFalse(Shipment.objects.exists())
+        call_command("benchmark_allocation", "--strategy", "first_fit", "--keep", stdout=StringIO())
+        self.assertTrue(Shipment.objects.exists())
+
+
+class ProductStatusTests(TestCase):
+    def test_only_stale_statuses_are_rewritten(self):
+        fresh = make_product("fresh", 10)
+        stale = make_product("stale", 0)
+        Product.objects.filter(pk=stale.pk).update(status="sufficient")
+
+        changed = refresh_product_status([fresh.pk, stale.pk])
+
+        self.assertEqual(changed, 1)
+        self.assertEqual(Product.objects.get(pk=stale.pk).status, "on_demand")
+        self.assertEqual(Product.objects.get(pk=fresh.pk).status, "sufficient")
+
+    def test_equal_stock_and_demand_is_on_demand(self):
+        product = make_product("widget", 5)
+        make_order(product, 5)
+
+        self.assertEqual(Product.objects.get(pk=product.pk).status, "on_demand")
+
+    def test_status_expression_follows_update_status(self):
+        product = make_product("widget", 4)
+        for required in (0, 3, 4, 9):
+            Product.objects.filter(pk=product.pk).update(total_required_quantity=required)
+            refresh_product_status([product.pk])
+            product.refresh_from_db()
+            expected = product.status
+            product.update_status()
+            self.assertEqual(expected, product.status)
+
+
+@override_settings(INCREMENTAL_ALLOCATION=False)
+class AllocationJobTests(TestCase):
+    def test_submissions_are_deduplicated_while_a_job_is_active(self):
+        job, created = submit_allocation_job()
+        again, created_again = submit_allocation_job("first_fit")
+
+        self.assertTrue(created)
+        self.assertEqual((again.pk, created_again), (job.pk, False))
+        with self.assertRaises(ValueError):
+            submit_allocation_job("no-such-strategy")
+
+    def test_invalid_chunk_sizes_are_rejected(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username="admin", is_staff=True))
+
+        for chunk_size in (-5, 0, "abc", 2.5):
+            for url in ("/api/allocation-jobs/", "/api/allocate-orders/"):
+                response = client.post(url, {"chunk_size": chunk_size}, format="json")
+                self.assertEqual(response.status_code, 400, (url, chunk_size))
+                self.assertIn("chunk_size", response.data["error"])
+        self.assertFalse(AllocationJob.objects.exists())
+
+    def test_other_integrity_errors_are_not_taken_for_a_duplicate(self):
+        with mock.patch.object(AllocationJob.objects, "create", side_effect=IntegrityError("CHECK constraint failed")):
+            with self.assertRaises(IntegrityError):
+                submit_allocation_job()
+
+    def test_worker_runs_the_claimed_job(self):
+        make_driver(10)
+        make_order(make_product("widget", 10), 4)
+        job, _ = submit_allocation_job()
+
+        run_job(claim_next_job())
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.orders_processed, job.shipments_created), ("succeeded", 1, 1))
+        self.assertIsNone(claim_next_job())
+
+    def test_failed_job_keeps_its_progress(self):
+        submit_allocation_job()
+        job = claim_next_job()
+
+        def fail_after_a_chunk(strategy, chunk_size, progress):
+            progress(10, 7, 3)
+            raise allocation.AllocationError("stock keeps changing")
+
+        with mock.patch("app.jobs.run_allocation", fail_after_a_chunk):
+            run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertEqual((job.orders_processed, job.shipments_created, job.orders_skipped), (10, 7, 3))
+
+    def test_silent_workers_are_failed(self):
+        submit_allocation_job()
+        job = claim_next_job()
+        AllocationJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(minutes=10))
+
+        self.assertEqual(fail_stale_jobs(stale_after=60), 1)
+        self.assertEqual(AllocationJob.objects.get(pk=job.pk).status, "failed")
+
+
+class TrackedFieldsTests(TestCase):
+    def setUp(self):
+        self.product = make_product("widget", 100)
+        self.order = make_order(self.product, 6)
+
+    def required(self):
+        return Product.objects.get(pk=self.product.pk).total_required_quantity
+
+    def test_saving_a_loaded_order_does_not_read_it_again(self):
+        order = Order.objects.get(pk=self.order.pk)
+        order.required_qty = 8
+
+        with CaptureQueriesContext(connection) as queries:
+            order.save()
+
+        self.assertFalse([query for query in queries if 'FROM "app_order"' in query["sql"]])
+        self.assertEqual(self.required(), 8)
+
+    def test_cancelling_an_order_loaded_without_its_quantity(self):
+        order = Order.objects.only("order_id", "status").get(pk=self.order.pk)
+        order.status = "cancelled"
+        order.save()
+
+        self.assertEqual(self.required(), 0)
+
+    def test_changing_a_deferred_quantity(self):
+        order = Order.objects.defer("required_qty").get(pk=self.order.pk)
+        order.required_qty = 2
+        order.save()
+
+        self.assertEqual(self.required(), 2)
+        self.assertEqual(order.previous_value("required_qty"), 2)
+
+
+class BulkOrderTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username="uploader"))
+        self.widget = make_product("widget", 100)
+        self.gadget = make_product("gadget", 100)
+        self.retailer = Retailer.objects.create(name="shop", address="-", contact="-", distance_from_warehouse=3)
+
+    def upload(self, rows):
+        return self.client.post("/api/orders/bulk/", {"orders": rows}, format="json")
+
+    def test_requirements_are_added_per_product(self):
+        rows = [
+            {"retailer": self.retailer.pk, "product": self.widget.pk, "required_qty": 4},
+            {"retailer": self.retailer.pk, "product": self.widget.pk, "required_qty": 5},
+            {"retailer": self.retailer.pk, "product": self.gadget.pk, "required_qty": 2},
+        ]
+
+        response = self.upload(rows)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 3)
+        self.assertEqual(Order.objects.filter(status="pending").count(), 3)
+        self.assertEqual(Product.objects.get(pk=self.widget.pk).total_required_quantity, 9)
+        self.assertEqual(Product.objects.get(pk=self.gadget.pk).total_required_quantity, 2)
+
+    def test_one_invalid_row_rejects_the_upload(self):
+        rows = [
+            {"retailer": self.retailer.pk, "product": self.widget.pk, "required_qty": 4},
+            {"retailer": self.retailer.pk, "product": self.widget.pk, "required_qty": 0},
+            {"retailer": self.retailer.pk, "product": 999999, "required_qty": 1},
+            "not an order",
+        ]
+
+        response = self.upload(rows)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error["index"] for error in response.data["errors"]], [1, 2, 3])
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Product.objects.get(pk=self.widget.pk).total_required_quantity, 0)
+
+    def test_empty_upload_is_rejected(self):
+        self.assertEqual(self.upload([]).status_code, 400)
+
+
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        self.product = make_product("widget", 10)
+
+    def counters(self):
+        return Product.objects.filter(pk=self.product.pk).values(*QUANTITY_FIELDS).get()
+
+    def test_ledger_adds_up_to_the_counters(self):
+        order = make_order(self.product, 4)
+        adjust_quantities({self.product.pk: {"available_quantity": 5}}, kind="receipt")
+        order.status = "cancelled"
+        order.save()
+
+        self.assertEqual(stock_at(timezone.now())[self.product.pk], self.counters())
+
+    def test_clamped_adjustment_records_what_was_applied(self):
+        adjust_quantities({self.product.pk: {"available_quantity": -25}})
+
+        self.assertEqual(self.counters()["available_quantity"], 0)
+        self.assertEqual(stock_at(timezone.now())[self.product.pk]["available_quantity"], 0)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).status, "on_demand")
+
+    def test_guarded_shortfall_changes_and_records_nothing(self):
+        other = make_product("gadget", 10)
+
+        updated = adjust_quantities(
+            {self.product.pk: {"available_quantity": -25}, other.pk: {"available_quantity": -3}}, guard=True,
+        )
+
+        self.assertEqual(updated, 1)
+        self.assertEqual(self.counters()["available_quantity"], 10)
+        self.assertFalse(StockMovement.objects.filter(product=self.product, kind="adjustment").exists())
+        self.assertEqual(stock_at(timezone.now())[other.pk]["available_quantity"], 7)
+
+    def test_levels_before_a_movement_and_after_compaction(self):
+        before = timezone.now()
+        adjust_quantities({self.product.pk: {"available_quantity": 5}}, kind="receipt")
+
+        self.assertEqual(stock_at(before)[self.product.pk]["available_quantity"], 10)
+        self.assertEqual(compact(settle_seconds=0), 1)
+        adjust_quantities({self.product.pk: {"available_quantity": -2}})
+        self.assertEqual(stock_at(timezone.now())[self.product.pk], self.counters())
+        self.assertEqual(compact(settle_seconds=0), 1)
+        self.assertEqual(compact(settle_seconds=0), 0)
+
+    def test_compaction_stops_at_the_settled_movement(self):
+        # A movement an open transaction may still commit below must not be passed by a snapshot
+        adjust_quantities({self.product.pk: {"available_quantity": 5}}, kind="receipt")
+        settled = StockMovement.objects.latest("movement_id").movement_id
+        adjust_quantities({self.product.pk: {"available_quantity": -2}})
+
+        with mock.patch("app.ledger.settled_movement_id", return_value=settled):
+            self.assertEqual(compact(settle_seconds=0), 1)
+        snapshot = self.product.snapshots.get()
+        self.assertEqual((snapshot.last_movement_id, snapshot.available_quantity), (settled, 15))
+
+        self.assertEqual(compact(settle_seconds=0), 1)
+        self.assertEqual(stock_at(timezone.now())[self.product.pk], self.counters())
+
+    def test_impossible_date_is_a_bad_request(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username="admin", is_staff=True))
+
+        for at in ("2020-13-45T00:00:00", "yesterday"):
+            self.assertEqual(client.get("/api/stock/at/", {"at": at}).status_code, 400)
+        response = client.get("/api/stock/at/", {"products": str(self.product.pk)})
+        self.assertEqual(response.data["products"][0]["available_quantity"], 10)
+
+
+@override_settings(INCREMENTAL_ALLOCATION=False)
+class DeliveryTests(TestCase):
+    def setUp(self):
+        self.product = make_product("widget", 20)
+        self.driver = make_driver(5)
+        make_driver(5)
+        self.order = make_order(self.product, 8)
+        allocation.run_allocation()
+        self.shipments = list(Shipment.objects.filter(order=self.order).order_by("shipment_id"))
+
+    def deliver(self, *shipments, employee=None):
+        return update_shipment_statuses({shipment.pk: "delivered" for shipment in shipments}, employee=employee)
+
+    def test_order_is_delivered_with_its_last_shipment(self):
+        first, second = self.shipments
+
+        self.deliver(first)
+        self.assertEqual(Order.objects.get(pk=self.order.pk).status, "allocated")
+        self.deliver(second)
+
+        self.assertEqual(Order.objects.get(pk=self.order.pk).status, "delivered")
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual((product.total_required_quantity, product.total_shipped), (0, 8))
+
+    def test_batch_is_all_or_nothing(self):
+        with self.assertRaises(DeliveryError):
+            update_shipment_statuses({self.shipments[0].pk: "delivered", 999999: "delivered"})
+        with self.assertRaises(DeliveryError):
+            update_shipment_statuses({self.shipments[0].pk: "lost"})
+
+        self.assertEqual(set(Shipment.objects.values_list("status", flat=True)), {"in_transit"})
+
+    def test_employees_only_update_their_own_shipments(self):
+        other = next(shipment for shipment in self.shipments if shipment.employee_id != self.driver.pk)
+
+        with self.assertRaises(DeliveryError):
+            self.deliver(other, employee=self.driver)
+
+    def test_delivered_shipment_cannot_go_back(self):
+        self.deliver(self.shipments[0])
+
+        with self.assertRaises(DeliveryError):
+            update_shipment_statuses({self.shipments[0].pk: "in_transit"})
+
+    def test_admin_save_takes_the_same_path(self):
+        for shipment in Shipment.objects.filter(order=self.order):
+            shipment.status = "delivered"
+            shipment.save()
+
+        self.assertEqual(Order.objects.get(pk=self.order.pk).status, "delivered")
+        self.assertEqual(Product.objects.get(pk=self.product.pk).total_shipped, 8)
+
+
+@override_settings(INCREMENTAL_ALLOCATION=False)
+class TruckCounterTests(TestCase):
+    def setUp(self):
+        self.product = make_product("widget", 20)
+        self.driver = make_driver(10)
+
+    def truck(self):
+        return Truck.objects.get(pk=self.driver.truck_id)
+
+    def test_counters_follow_the_shipments(self):
+        make_order(self.product, 3)
+        make_order(self.product, 4)
+        allocation.run_allocation()
+
+        truck = self.truck()
+        self.assertEqual((truck.in_transit_count, truck.remaining_capacity, truck.is_available), (2, 3, False))
+
+        shipments = list(Shipment.objects.order_by("shipment_id"))
+        update_shipment_statuses({shipments[0].pk: "delivered"})
+        self.assertEqual((self.truck().in_transit_count, self.truck().remaining_capacity), (1, 3 + shipments[0].quantity))
+        shipments[1].delete()
+        truck = self.truck()
+        self.assertEqual((truck.in_transit_count, truck.remaining_capacity, truck.is_available), (0, 10, True))
+
+    def test_capacity_edit_keeps_the_load(self):
+        make_order(self.product, 4)
+        allocation.run_allocation()
+
+        truck = self.truck()
+        truck.capacity = 15
+        truck.save()
+
+        truck = self.truck()
+        self.assertEqual((truck.in_transit_count, truck.remaining_capacity), (1, 11))
+
+    def test_reassigned_shipment_moves_its_load(self):
+        make_order(self.product, 4)
+        allocation.run_allocation()
+        other = make_driver(10)
+
+        shipment = Shipment.objects.get()
+        shipment.employee = other
+        shipment.save()
+
+        truck = self.truck()
+        self.assertEqual((truck.in_transit_count, truck.remaining_capacity, truck.is_available), (0, 10, True))
+        other_truck = Truck.objects.get(pk=other.truck_id)
+        self.assertEqual((other_truck.in_transit_count, other_truck.remaining_capacity, other_truck.is_available), (1, 6, False))
+
+        shipment.status = "delivered"
+        shipment.save()
+        other_truck.refresh_from_db()
+        self.assertEqual((other_truck.in_transit_count, other_truck.remaining_capacity, other_truck.is_available), (0, 10, True))
+        self.assertEqual(self.truck().in_transit_count, 0)
+
+    def test_resized_shipment_adjusts_the_remaining_capacity(self):
+        make_order(self.product, 4)
+        allocation.run_allocation()
+
+        shipment = Shipment.objects.get()
+        shipment.quantity = 6
+        shipment.save()
+
+        truck = self.truck()
+        self.assertEqual((truck.in_transit_count, truck.remaining_capacity), (1, 4))
+
+
+class EmployeeProvisioningTests(TestCase):
+    def setUp(self):
+        self.group = Group.objects.create(name="Employee")
+        self.trucks = [Truck.objects.create(license_plate=f"FREE-{i}", capacity=10) for i in range(2)]
+
+    def test_joining_the_group_assigns_a_free_truck(self):
+        first, second, third = (User.objects.create(username=f"user-{i}") for i in range(3))
+
+        first.groups.add(self.group)
+        self.group.user_set.add(second, third)
+
+        trucks = [User.objects.get(pk=user.pk).employee_profile.truck_id for user in (first, second, third)]
+        self.assertEqual(trucks, [self.trucks[0].pk, self.trucks[1].pk, None])
+
+    def test_free_truck_lookup_does_not_join_employees(self):
+        user = User.objects.create(username="driver")
+
+        with CaptureQueriesContext(connection) as queries:
+            user.groups.add(self.group)
+
+        truck_query = next(query["sql"] for query in queries if query["sql"].startswith('SELECT "app_truck"'))
+        self.assertNotIn("JOIN", truck_query)
+        self.assertIn("NOT EXISTS", truck_query)
+
+    def test_ordinary_user_saves_do_not_provision(self):
+        user = User.objects.create(username="customer")
+        user.last_login = timezone.now()
+        user.save()
+
+        self.assertFalse(Employee.objects.exists())
+
+
+@override_settings(INCREMENTAL_ALLOCATION=False)
+class CategorySummaryTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="tools")
+        self.products = [make_product(f"tool-{i}", 5, self.category) for i in range(3)]
+
+    def assertSummaryMatchesProducts(self):
+        summary = CategoryStockSummary.objects.filter(category=self.category).values(*SUMMARY_FIELDS).get()
+        products = Product.objects.filter(category=self.category)
+        self.assertEqual(summary, {
+            "product_count": products.count(),
+            "on_demand_count": products.filter(status="on_demand").count(),
+            **{field: sum(products.values_list(field, flat=True)) for field in QUANTITY_FIELDS},
+        })
+
+    def test_summary_follows_orders_allocation_and_delivery(self):
+        make_driver(10)
+        make_order(self.products[0], 4)
+        make_order(self.products[1], 9)
+        self.assertSummaryMatchesProducts()
+        allocation.run_allocation()
+        self.assertSummaryMatchesProducts()
+        update_shipment_statuses({shipment.pk: "delivered" for shipment in Shipment.objects.all()})
+        self.assertSummaryMatchesProducts()
+        adjust_quantities({self.products[2].pk: {"available_quantity": -50}})
+        self.assertSummaryMatchesProducts()
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=self.products[2].pk).delete()
+        self.assertSummaryMatchesProducts()
+
+    def test_order_writes_cost_the_same_in_any_category_size(self):
+        def save_cost(product):
+            with CaptureQueriesContext(connection) as queries:
+                make_order(product, 3)
+            return len(queries)
+
+        small = save_cost(self.products[0])
+        for i in range(30):
+            make_product(f"more-{i}", 5, self.category)
+        self.assertEqual(save_cost(self.products[0]), small)
+
+    def test_product_edits_move_the_summaries_without_reaggregating(self):
+        other = Category.objects.create(name="garden")
+        make_product("rake", 2, other)
+        product = Product.objects.get(pk=self.products[0].pk)
+
+        with CaptureQueriesContext(connection) as queries:
+            make_product("hammer", 0, self.category)
+            product.available_quantity = 12
+            product.total_required_quantity = 20
+            product.save()
+            product.category = other
+            product.save()
+        self.assertFalse([query["sql"] for query in queries if "COUNT(" in query["sql"]])
+        self.assertSummaryMatchesProducts()
+        self.assertEqual(
+            CategoryStockSummary.objects.filter(category=other).values_list("product_count", "on_demand_count", "available_quantity").get(),
+            (2, 1, 14),
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertEqual(
+            CategoryStockSummary.objects.filter(category=other).values_list("product_count", "on_demand_count", "available_quantity").get(),
+            (1, 0, 2),
+        )
+
+    def test_reconcile_rebuilds_drifted_summaries(self):
+        CategoryStockSummary.objects.filter(category=self.category).update(available_quantity=999, on_demand_count=3)
+
+        call_command("reconcile_product_counters", "--fix", stdout=StringIO())
+
+        self.assertSummaryMatchesProducts()
+
+
+class StockAlertTests(TestCase):
+    def setUp(self):
+        self.product = make_product("widget", 10)
+
+    def open_alerts(self):
+        return list(StockAlert.objects.filter(resolved_at__isnull=True).values_list("kind", flat=True))
+
+    def test_alert_opens_once_and_resolves_when_restocked(self):
+        StockAlertRule.objects.create(product=self.product, min_available=5, alert_on_demand=False)
+
+        adjust_quantities({self.product.pk: {"available_quantity": -7}})
+        adjust_quantities({self.product.pk: {"available_quantity": -1}})
+        self.assertEqual(self.open_alerts(), ["low_stock"])
+
+        adjust_quantities({self.product.pk: {"available_quantity": 10}}, kind="receipt")
+        self.assertEqual(self.open_alerts(), [])
+        self.assertEqual(StockAlert.objects.count(), 1)
+
+    def test_category_rule_covers_its_products(self):
+        other = make_product("gadget", 10)
+        StockAlertRule.objects.create(category=self.product.category, alert_on_demand=True)
+
+        make_order(other, 12)
+
+        self.assertEqual(list(StockAlert.objects.values_list("product_id", "kind")), [(other.pk, "on_demand")])
+
+    def test_reorder_point_and_deactivation(self):
+        ProductForecast.objects.create(
+            product=self.product, daily_demand=2, demand_std=1, safety_stock=3, reorder_point=12,
+            lead_time_days=7, history_days=90, computed_at=timezone.now(),
+        )
+        rule = StockAlertRule.objects.create(product=self.product, alert_on_demand=False, below_reorder_point=True)
+        self.assertEqual(self.open_alerts(), ["reorder"])
+
+        rule.is_active = False
+        rule.save()
+        self.assertEqual(self.open_alerts(), [])
+
+    def test_products_without_rules_cost_one_query(self):
+        with self.assertNumQueries(1):
+            evaluate_stock_alerts([self.product.pk])
+
+
+class ForecastTests(TestCase):
+    def test_smoothing_matches_the_recursive_definition(self):
+        demand = np.random.default_rng(7).integers(0, 20, size=(4, 30)).astype(float)
+        alpha = 0.3
+
+        daily_demand, demand_std, safety_stock, reorder_point = forecast(demand, alpha, lead_time_days=5, service_level=0.9)
+
+        for row, smoothed in zip(demand, daily_demand):
+            level = row.mean()
+            for value in row:
+                level = alpha * value + (1 - alpha) * level
+            self.assertAlmostEqual(smoothed, level)
+        np.testing.assert_allclose(demand_std, demand.std(axis=1))
+        self.assertTrue((reorder_point >= np.ceil(daily_demand * 5)).all())
+
+    def test_forecasts_follow_the_order_history(self):
+        widget = make_product("widget", 10)
+        gadget = make_product("gadget", 10)
+        today = timezone.localdate()
+        for days_ago, quantity in [(0, 4), (1, 2), (1, 3)]:
+            order = make_order(widget, quantity)
+            Order.objects.filter(pk=order.pk).update(order_date=timezone.now() - timedelta(days=days_ago))
+        cancelled = make_order(widget, 50)
+        cancelled.status = "cancelled"
+        cancelled.save()
+        ProductForecast.objects.create(
+            product=gadget, daily_demand=1, demand_std=0, safety_stock=0, reorder_point=1,
+            lead_time_days=7, history_days=90, computed_at=timezone.now() - timedelta(days=1),
+        )
+
+        product_ids, demand = load_daily_demand(history_days=3, today=today)
+        self.assertEqual(product_ids.tolist(), [widget.pk])
+        self.assertEqual(demand.tolist(), [[0, 5, 4]])
+
+        self.assertEqual(update_forecasts(history_days=3), 1)
+        self.assertEqual(list(ProductForecast.objects.values_list("product_id", flat=True)), [widget.pk])
+
+
+class ReconcileCommandTests(TestCase):
+    def test_drift_is_reported_and_fixed_through_the_ledger(self):
+        product = make_product("widget", 10)
+        make_order(product, 4)
+        Product.objects.filter(pk=product.pk).update(total_required_quantity=9, total_shipped=2)
+
+        out = StringIO()
+        call_command("reconcile_product_counters", stdout=out)
+        self.assertIn("1 drifted", out.getvalue())
+        self.assertEqual(Product.objects.get(pk=product.pk).total_required_quantity, 9)
+
+        call_command("reconcile_product_counters", "--fix", stdout=StringIO())
+        product.refresh_from_db()
+        self.assertEqual((product.total_required_quantity, product.total_shipped), (4, 0))
+        self.assertEqual(
+            StockMovement.objects.get(product=product, reference="reconciliation").required_delta, -5,
+        )
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username="viewer"))
+        product = make_product("widget", 1000)
+        orders = [make_order(product, 1) for _ in range(25)]
+        # Ties on the date are broken by the id
+        same_time = timezone.now() - timedelta(hours=1)
+        Order.objects.filter(pk__in=[order.pk for order in orders[5:15]]).update(order_date=same_time)
+        self.newest_first = list(Order.objects.order_by("-order_date", "-order_id").values_list("order_id", flat=True))
+
+    def walk(self, url, link):
+        pages = []
+        while url:
+            data = self.client.get(url).data
+            pages.append([row["order_id"] for row in data["results"]])
+            url = data[link]
+        return pages
+
+    def test_next_links_visit_every_order_once(self):
+        pages = self.walk("/api/orders/?page_size=10", "next")
+
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), self.newest_first)
+
+    def test_previous_links_walk_back(self):
+        first = self.client.get("/api/orders/?page_size=10").data
+        second = self.client.get(first["next"]).data
+
+        self.assertEqual([row["order_id"] for row in self.client.get(second["previous"]).data["results"]], self.newest_first[:10])
+
+    def test_new_orders_do_not_shift_later_pages(self):
+        first = self.client.get("/api/orders/?page_size=10").data
+        make_order(Product.objects.get(), 1)
+
+        second = self.client.get(first["next"]).data
+        self.assertEqual([row["order_id"] for row in second["results"]], self.newest_first[10:20])
+
+    def test_invalid_cursor_is_not_found(self):
+        self.assertEqual(self.client.get("/api/orders/?cursor=not-a-cursor").status_code, 404)
+
+    def test_numbered_pages_are_still_served(self):
+        data = self.client.get("/api/orders/?page=2").data
+
+        self.assertEqual(data["count"], 25)
+        self.assertEqual([row["order_id"] for row in data["results"]], self.newest_first[10:20])
+
+
+class CachedResponseTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username="admin", is_staff=True))
+        self.product = make_product("widget", 10)
+
+    def orders_placed(self):
+        return self.client.get("/api/count/").data["orders_placed"]
+
+    def test_hit_only_reads_the_versions(self):
+        self.orders_placed()
+
+        with self.assertNumQueries(1):
+            self.orders_placed()
+
+    def test_write_invalidates_after_commit(self):
+        self.assertEqual(self.orders_placed(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_order(self.product, 2)
+
+        self.assertEqual(self.orders_placed(), 1)
+
+    def test_change_bumped_by_another_process(self):
+        self.assertEqual(self.orders_placed(), 0)
+        # Another process writes without signals, then bumps the shared version
+        retailer = Retailer.objects.create(name="shop", address="-", contact="-", distance_from_warehouse=1)
+        Order.objects.bulk_create([Order(retailer=retailer, product=self.product, required_qty=1)])
+        self.assertEqual(self.orders_placed(), 0)
+
+        ResourceVersion.objects.filter(resource=cache.ORDERS).update(version=F("version") + 1)
+        self.assertEqual(self.orders_placed(), 1)
+
+    def test_bump_creates_missing_versions(self):
+        ResourceVersion.objects.filter(resource=cache.TRUCKS).delete()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cache.bump(cache.TRUCKS, cache.ORDERS)
+
+        self.assertEqual(cache.versions(cache.TRUCKS), (1,))
+
+    def test_seeding_bumps_what_it_wrote(self):
+        before = cache.versions(cache.ORDERS, cache.PRODUCTS)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("seed_data", categories=1, products=2, retailers=1, trucks=1, orders=3, stdout=StringIO())
+
+        self.assertTrue(all(after > was for after, was in zip(cache.versions(cache.ORDERS, cache.PRODUCTS), before)))
+
+
+class ConditionalResponseTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username="admin", is_staff=True))
+        make_order(make_product("widget", 10), 2)
+
+    def test_unchanged_list_is_not_modified(self):
+        response = self.client.get("/api/orders/")
+
+        with self.assertNumQueries(1):
+            again = self.client.get("/api/orders/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again["ETag"], response["ETag"])
+        since = self.client.get("/api/orders/", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(since.status_code, 304)
+
+    def test_pages_and_filters_have_their_own_etag(self):
+        etags = {self.client.get(url)["ETag"] for url in ("/api/orders/", "/api/orders/?status=pending", "/api/shipments/")}
+
+        self.assertEqual(len(etags), 3)
+
+    def test_change_from_another_process_revalidates(self):
+        etag = self.client.get("/api/orders/")["ETag"]
+
+        ResourceVersion.objects.filter(resource=cache.ORDERS).update(version=F("version") + 1, updated_at=timezone.now())
+
+        response = self.client.get("/api/orders/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_errors_carry_no_validators(self):
+        for url in ("/api/orders/?cursor=not-a-cursor", "/api/dashboard/stats/?kpis=no_such_kpi"):
+            response = self.client.get(url)
+            self.assertGreaterEqual(response.status_code, 400)
+            self.assertFalse(response.has_header("ETag"))
+            self.assertFalse(response.has_header("Last-Modified"))
+
+
+@override_settings(INCREMENTAL_ALLOCATION=False)
+class DashboardStatsTests(TestCase):
+    def test_empty_tables_count_zero(self):
+        stats = dashboard_stats()
+
+        self.assertEqual(set(stats), set(KPIS))
+        self.assertTrue(all(value == 0 for value in stats.values()))
+
+    def test_every_figure_in_one_query(self):
+        product = make_product("widget", 5)
+        make_driver(10)
+        make_driver(10)
+        make_order(product, 3)
+        make_order(product, 4)
+        allocation.run_allocation()
+
+        with self.assertNumQueries(1):
+            stats = dashboard_stats()
+
+        self.assertEqual(stats["orders_placed"], 2)
+        self.assertEqual((stats["orders_allocated"], stats["orders_pending"]), (1, 1))
+        self.assertEqual(stats["shipments_in_transit"], 1)
+        self.assertEqual(stats["products_on_demand"], 1)
+        self.assertEqual((stats["idle_trucks"], stats["employees_available"]), (1, 2))
+        self.assertEqual(stats["retailers_available"], 2)
+
+    def test_registered_figures_add_columns_not_queries(self):
+        make_product("widget", 0)
+        register_kpi("products_out_of_stock", Product, Count("pk", filter=Q(available_quantity=0)))
+        self.addCleanup(KPIS.pop, "products_out_of_stock")
+
+        with self.assertNumQueries(1):
+            stats = dashboard_stats(["products_out_of_stock", "orders_placed"])
+        self.assertEqual(stats, {"products_out_of_stock": 1, "orders_placed": 0})
+
+    def test_unknown_figure_is_rejected(self):
+        with self.assertRaises(ValueError):
+            dashboard_stats(["no_such_kpi"])
@@ -2,8 +2,8 @@ from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 from rest_framework.urlpatterns import format_suffix_patterns  # ✅ For better API format handling
 from .views import (
-    CustomAuthToken, get_employee_id,logout_view, get_employees, get_retailers,get_counts,
-    get_orders,get_users,get_employee_orders,recent_actions,get_employee_shipments,update_shipment_status,get_logged_in_user,allocate_orders, get_trucks, get_shipments,get_stock_data,category_stock_data,store_qr_code
+    CustomAuthToken, get_employee_id,logout_view, get_employees, get_retailers,get_counts,get_dashboard_stats,
+    get_orders,bulk_create_orders_view,get_users,get_employee_orders,recent_actions,get_employee_shipments,update_shipment_status,update_shipment_statuses_view,get_logged_in_user,allocate_orders, simulate_allocation, submit_allocation, allocation_job_status, get_trucks, get_shipments,get_stock_data,get_stock_summary,get_stock_alerts,get_stock_at,category_stock_data,store_qr_code
 )
 
 urlpatterns = [
@@ -16,19 +16,28 @@ urlpatterns = [
     path("employees/", get_employees, name="get_employees"),  # Admin Only
     path("retailers/", get_retailers, name="get_retailers"),  # Admin Only
     path("orders/", get_orders, name="get_orders"),  # Admin & Employees
+    path("orders/bulk/", bulk_create_orders_view, name="bulk_create_orders"),  # Bulk upload, all or nothing
     path("allocate-orders/", allocate_orders, name="allocate_orders"),  # Employees Only
+    path("allocate-orders/simulate/", simulate_allocation, name="simulate_allocation"),  # Dry run, writes nothing
+    path("allocation-jobs/", submit_allocation, name="submit_allocation"),  # Background run (allocation_worker)
+    path("allocation-jobs/<int:job_id>/", allocation_job_status, name="allocation_job_status"),
     path("trucks/", get_trucks, name="get_trucks"),  # Admin Only
     path("shipments/", get_shipments, name="get_shipments"),  # Admin & Employees.
     path('stock/', get_stock_data, name='stock-data'),
+    path('stock/summary/', get_stock_summary, name='stock-summary'),  # Pre-aggregated per category
+    path('stock/alerts/', get_stock_alerts, name='stock-alerts'),  # Rules are managed in the admin
+    path('stock/at/', get_stock_at, name='stock-at'),  # Point in time, from the stock ledger
     path('category-stock/', category_stock_data, name='category-stock-data'),
     path('store_qr/', store_qr_code, name='store_qr'),
     
     #count
     path('count/', get_counts, name='count'),   
+    path('dashboard/stats/', get_dashboard_stats, name='dashboard_stats'),  # All KPIs, one query
     path('users/', get_users, name='get_users'), 
     path('user_detail/', get_logged_in_user, name='get_logged_in_user'),
     path('employee_shipments/', get_employee_shipments, name='employee_shipments'),
     path('update_shipment_status/', update_shipment_status, name='update-shipment-status'),
+    path('update_shipment_statuses/', update_shipment_statuses_view, name='update-shipment-statuses'),  # Batch, all or nothing
     path('employee_orders/', get_employee_orders, name='get_employee_orders'),
     path('recent_actions/', recent_actions, name='recent_actions'),
     path('employee_id/', get_employee_id, name='get_employee_id'),
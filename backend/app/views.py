@@ -1,21 +1,33 @@
+import base64
 import json
 import logging
-from django.db import transaction
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated,IsAdminUser
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework import status
-from rest_framework.pagination import PageNumberPagination
-from django.db.models import Count
-from .models import Employee, Retailer, Order, Truck, Shipment, Product, Category
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+from .models import Employee, Retailer, Order, Truck, Shipment, Product, Category, AllocationJob, CategoryStockSummary, StockAlert
 from .serializers import (
     EmployeeSerializer, RetailerSerializer, 
-    OrderSerializer, ProductSerializer, TruckSerializer, ShipmentSerializer, CategorySerializer
+    OrderSerializer, ProductSerializer, TruckSerializer, ShipmentSerializer, CategorySerializer,
+    AllocationJobSerializer, CategoryStockSummarySerializer, StockAlertSerializer
 )
-from .allocation import allocate_shipments
-from django.db.models import F
+from .allocation import allocate_shipments, get_chunk_size, AllocationSnapshot
+from .jobs import submit_allocation_job
+from .orders import bulk_create_orders, OrderValidationError
+from .delivery import update_shipment_statuses, DeliveryError, SHIPMENT_STATUSES
+from .stock import adjust_quantities, SUMMARY_FIELDS
+from .ledger import stock_at
+from .dashboard import dashboard_stats
+from .cache import cached_response, conditional_response, ADMIN_LOG, CATEGORIES, EMPLOYEES, ORDERS, PRODUCTS, RETAILERS, SHIPMENTS, TRUCKS
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
 from django.shortcuts import redirect
 from django.contrib.auth.models import User
 from django.http import JsonResponse
@@ -29,6 +41,102 @@ class StandardPagination(PageNumberPagination):
     page_size_query_param = "page_size"
     max_page_size = 100
 
+# ✅ Keyset (cursor) pagination for the large, append-only lists
+class KeysetPagination(BasePagination):
+    """
+    Pages newest first on (date_field, id_field) with an opaque cursor holding
+    the last row's key, so every page is an index range read: no COUNT(*), no
+    OFFSET, and rows inserted meanwhile never shift the following pages.
+    Responses carry "next" / "previous" links and "results".
+    """
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+
+    def __init__(self, date_field, id_field):
+        self.date_field = date_field
+        self.id_field = id_field
+
+    def encode_cursor(self, row, reverse):
+        position = {"d": getattr(row, self.date_field).isoformat(), "i": getattr(row, self.id_field), "r": int(reverse)}
+        token = base64.urlsafe_b64encode(json.dumps(position, separators=(",", ":")).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(token.encode()))
+            date = parse_datetime(position["d"])
+            if date is None:
+                raise ValueError
+            return date, int(position["i"]), bool(position["r"])
+        except (ValueError, TypeError, KeyError):
+            raise NotFound("Invalid cursor")
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor[2])
+
+        # Newest first; a "previous" cursor walks the other way and is flipped back below
+        ordering = (self.date_field, self.id_field) if reverse else (f"-{self.date_field}", f"-{self.id_field}")
+        queryset = queryset.order_by(*ordering)
+        if cursor:
+            date, row_id, _ = cursor
+            after = "gt" if reverse else "lt"
+            # The plain range on the date lets the (date, id) index bound the scan
+            queryset = queryset.filter(**{f"{self.date_field}__{after}e": date}).filter(
+                Q(**{f"{self.date_field}__{after}": date}) | Q(**{f"{self.id_field}__{after}": row_id})
+            )
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_link = self.previous_link = None
+        if rows:
+            if has_more or reverse:
+                self.next_link = self.encode_cursor(rows[-1], reverse=False)
+            if (has_more and reverse) or (cursor and not reverse):
+                self.previous_link = self.encode_cursor(rows[0], reverse=True)
+        elif cursor:
+            self.previous_link = remove_query_param(self.base_url, self.cursor_query_param)
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.next_link, "previous": self.previous_link, "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+def list_paginator(request, date_field, id_field):
+    """Keyset pagination, unless the caller asks for a numbered ?page= (which also returns a count)."""
+    if "page" in request.query_params:
+        return StandardPagination()
+    return KeysetPagination(date_field, id_field)
+
 # ✅ Custom JWT Login View
 class CustomAuthToken(TokenObtainPairView):
     def post(self, request, *args, **kwargs):
@@ -64,6 +172,7 @@ def logout_view(request):
 # ✅ Get Employees (Admin Only)
 @api_view(["GET"])
 @permission_classes([IsAuthenticated, IsAdminUser])
+@conditional_response(EMPLOYEES)
 def get_employees(request):
     try:
         employees = Employee.objects.all()
@@ -77,6 +186,7 @@ def get_employees(request):
 # ✅ Get Retailers (Admin Only)
 @api_view(["GET"])
 @permission_classes([IsAuthenticated, IsAdminUser])
+@conditional_response(RETAILERS)
 def get_retailers(request):
     try:
         retailers = Retailer.objects.all()
@@ -90,21 +200,46 @@ def get_retailers(request):
 # ✅ Get Orders (Anyone Logged In)
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@conditional_response(ORDERS)
 def get_orders(request):
     try:
         status_filter = request.GET.get("status")
-        orders = Order.objects.all().order_by("-order_date")
+        orders = Order.objects.all().order_by("-order_date", "-order_id")
 
         if status_filter:
             orders = orders.filter(status=status_filter)
 
-        paginator = StandardPagination()
+        paginator = list_paginator(request, "order_date", "order_id")
         paginated_orders = paginator.paginate_queryset(orders, request)
         serializer = OrderSerializer(paginated_orders, many=True)
         return paginator.get_paginated_response(serializer.data)
+    except NotFound as e:
+        return Response({"error": str(e.detail)}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def bulk_create_orders_view(request):
+    """
+    Creates many orders in one request, all or nothing.
+
+    Body: {"orders": [{"retailer": id, "product": id, "required_qty": n}, ...]}
+    (a bare list is accepted too). Invalid rows are reported by index.
+    """
+    rows = request.data.get("orders") if isinstance(request.data, dict) else request.data
+    try:
+        orders = bulk_create_orders(rows)
+    except OrderValidationError as e:
+        return Response({"errors": e.errors}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return Response(
+        {"created": len(orders), "order_ids": [order.order_id for order in orders]},
+        status=status.HTTP_201_CREATED,
+    )
+
 # ✅ Get Trucks (Admin Only)
 @api_view(["GET"])
 @permission_classes([IsAuthenticated, IsAdminUser])
@@ -121,67 +256,188 @@ def get_trucks(request):
 # ✅ Get Shipments (Anyone Logged In)
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@conditional_response(SHIPMENTS)
 def get_shipments(request):
     try:
-        shipments = Shipment.objects.all().order_by("-shipment_date")  # Fix applied here
-        paginator = StandardPagination()
+        shipments = Shipment.objects.all().order_by("-shipment_date", "-shipment_id")  # Fix applied here
+        paginator = list_paginator(request, "shipment_date", "shipment_id")
         paginated_shipments = paginator.paginate_queryset(shipments, request)
         serializer = ShipmentSerializer(paginated_shipments, many=True)
         return paginator.get_paginated_response(serializer.data)
+    except NotFound as e:
+        return Response({"error": str(e.detail)}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])  
 def allocate_orders(request):
-    try:
-        with transaction.atomic():
-            allocation_result = allocate_shipments(request)
-
-            if isinstance(allocation_result, Response):
-                return allocation_result
+    # Allocation commits chunk by chunk, locks its own rows and refreshes the
+    # status of the products it touches, so there is nothing left to do here
+    return allocate_shipments(request)
 
-            # ✅ Ensure all product statuses are updated
-            products = Product.objects.all()
-            for product in products:
-                product.save()  # This will call update_status() before saving
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def simulate_allocation(request):
+    """
+    Previews an allocation without writing anything.
+
+    Body (all optional):
+        strategy: allocation strategy name
+        extra_trucks: list of capacities of hypothetical extra trucks
+        returned_employees: employee ids whose in-transit trucks count as back
+        restock: {product_id: quantity} added to current stock
+        scenarios: list of objects with the fields above, planned on one snapshot
+    """
+    try:
+        scenarios = request.data.get("scenarios") or [request.data]
+        overrides = [
+            {
+                "strategy": scenario.get("strategy", request.data.get("strategy")),
+                "extra_trucks": [int(capacity) for capacity in scenario.get("extra_trucks", [])],
+                "returned_employees": [int(employee_id) for employee_id in scenario.get("returned_employees", [])],
+                "restock": {int(product_id): int(quantity) for product_id, quantity in scenario.get("restock", {}).items()},
+            }
+            for scenario in scenarios
+        ]
+    except (AttributeError, TypeError, ValueError):
+        return Response({"error": "Invalid simulation overrides"}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(
-            {"message": "Orders allocated and stock status updated successfully"},
-            status=status.HTTP_200_OK,
-        )
+    try:
+        snapshot = AllocationSnapshot()
+        results = [snapshot.simulate(**scenario) for scenario in overrides]
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    if "scenarios" in request.data:
+        return Response({"scenarios": results}, status=status.HTTP_200_OK)
+    return Response(results[0], status=status.HTTP_200_OK)
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def submit_allocation(request):
+    """
+    Queues a full allocation pass for the allocation_worker command and returns
+    at once. While a job is queued or running, that job is returned instead.
+    """
+    try:
+        chunk_size = get_chunk_size(request.data.get("chunk_size"))
+        job, created = submit_allocation_job(request.data.get("strategy"), chunk_size, request.user)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    data = AllocationJobSerializer(job).data
+    data["created"] = created
+    return Response(data, status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK)
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def allocation_job_status(request, job_id):
+    """Reports an allocation job's status, progress, timing and, once finished, its result."""
+    try:
+        job = AllocationJob.objects.get(job_id=job_id)
+    except AllocationJob.DoesNotExist:
+        return Response({"error": "Allocation job not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response(AllocationJobSerializer(job).data)
+
 # ✅ Get Stock Data (Admin Only)
 @api_view(["GET"])
 @permission_classes([IsAuthenticated, IsAdminUser])
+@conditional_response(PRODUCTS, CATEGORIES)
+@cached_response(PRODUCTS, CATEGORIES)
 def get_stock_data(request):
     if not request.user.is_staff:
         return Response({"detail": "Access denied. Admins only."}, status=status.HTTP_403_FORBIDDEN)
 
-    products = Product.objects.all()
+    products = Product.objects.select_related('category')  # ✅ Category names in the same query
     serializer = ProductSerializer(products, many=True)
     return Response(serializer.data)
 
+# ✅ Stock Summary per Category (Admin Only)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsAdminUser])
+@conditional_response(PRODUCTS, CATEGORIES)
+def get_stock_summary(request):
+    """
+    Per-category stock totals plus overall totals, read from the maintained
+    CategoryStockSummary rows (one row per category, whatever the catalogue size).
+    """
+    summaries = CategoryStockSummary.objects.select_related('category').order_by('category__name')
+    data = CategoryStockSummarySerializer(summaries, many=True).data
+    totals = {field: sum(row[field] for row in data) for field in SUMMARY_FIELDS}
+    return Response({"categories": data, "totals": totals})
+
+# ✅ Stock Alerts (Admin Only)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def get_stock_alerts(request):
+    """Lists stock alerts, newest first. ``?status=open`` or ``?status=resolved`` filters them."""
+    try:
+        alerts = StockAlert.objects.select_related('product').order_by('-created_at', '-alert_id')
+        status_filter = request.GET.get("status")
+        if status_filter == "open":
+            alerts = alerts.filter(resolved_at__isnull=True)
+        elif status_filter == "resolved":
+            alerts = alerts.filter(resolved_at__isnull=False)
+
+        paginator = StandardPagination()
+        paginated_alerts = paginator.paginate_queryset(alerts, request)
+        serializer = StockAlertSerializer(paginated_alerts, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# ✅ Point-in-time Stock (Admin Only)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def get_stock_at(request):
+    """
+    Returns product counters as they stood at ``?at=<ISO datetime>`` (default now),
+    read from the stock ledger. ``?products=1,2,3`` limits the products returned.
+    """
+    try:
+        at = parse_datetime(request.GET["at"]) if request.GET.get("at") else timezone.now()
+    except ValueError:
+        # Well formed but impossible, e.g. month 13
+        at = None
+    if at is None:
+        return Response({"error": "Invalid 'at' datetime"}, status=status.HTTP_400_BAD_REQUEST)
+    if timezone.is_naive(at):
+        at = timezone.make_aware(at)
+
+    try:
+        products = request.GET.get("products")
+        product_ids = [int(product_id) for product_id in products.split(",")] if products else None
+    except ValueError:
+        return Response({"error": "Invalid product ids"}, status=status.HTTP_400_BAD_REQUEST)
+
+    levels = stock_at(at, product_ids)
+    return Response({
+        "at": at,
+        "products": [{"product_id": product_id, **counters} for product_id, counters in sorted(levels.items())],
+    })
+
 # ✅ Get Category Stock Data (Accessible by Anyone)
 @api_view(["GET"])
+@conditional_response(CATEGORIES, PRODUCTS)
+@cached_response(CATEGORIES, PRODUCTS)
 def category_stock_data(request):
     """
     Returns category names and product count for visualization.
     """
     try:
-        categories = Category.objects.annotate(product_count=Count('products'))  # ✅ Count products per category
+        # ✅ Product counts come from the maintained per-category summary, no aggregation per request
+        categories = Category.objects.annotate(product_count=Coalesce(F('stock_summary__product_count'), 0))
 
         # Serialize the data
         serialized_data = CategorySerializer(categories, many=True).data
 
         # Attach product_count to each category in serialized data
         for category in serialized_data:
-            category["value"] = next(
-                (cat["product_count"] for cat in categories.values("name", "product_count") if cat["name"] == category["name"]),
-                0
-            )
+            category["value"] = category["product_count"]
 
         return Response({"success": True, "data": serialized_data})
     except Exception as e:
@@ -210,22 +466,15 @@ def store_qr_code(request):
         # Fetch or create the category
         category, _ = Category.objects.get_or_create(name=category_name)
 
-        # Fetch existing product or create a new one
+        # Fetch existing product or create a new one with the scanned quantity
         product, created = Product.objects.get_or_create(
             name=product_name, category=category,
-            defaults={"available_quantity": 0}  # Ensure no NULL values
+            defaults={"available_quantity": quantity}
         )
 
-        if created:
-            product.available_quantity = quantity  # Set quantity for new product
-        else:
-            # Update quantity safely using F() expression
-            Product.objects.filter(product_id=product.product_id).update(
-                available_quantity=F('available_quantity') + quantity
-            )
-            product.refresh_from_db()  # Fetch updated values from DB
-
-        product.save()  # Save to trigger signals
+        if not created:
+            # Add the quantity in SQL and refresh the status of this product only
+            adjust_quantities({product.product_id: {"available_quantity": quantity}}, kind="receipt", reference="qr scan")
 
         return Response({"message": "Product updated successfully"}, status=201)
 
@@ -235,25 +484,42 @@ def store_qr_code(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsAdminUser])
+@conditional_response(ORDERS, EMPLOYEES, RETAILERS)
+@cached_response(ORDERS, EMPLOYEES, RETAILERS)
 def get_counts(request):
     try:
-        order_count = Order.objects.count()
-        pending_order_count = Order.objects.filter(status="pending").count()
-        employee_count = Employee.objects.count()
-        retailer_count = Retailer.objects.count()
+        # ✅ One round trip for all four counts
+        stats = dashboard_stats(["orders_placed", "orders_pending", "employees_available", "retailers_available"])
 
         return Response(
             {
-                "orders_placed": order_count,
-                "pending_orders": pending_order_count,
-                "employees_available": employee_count,
-                "retailers_available": retailer_count,
+                "orders_placed": stats["orders_placed"],
+                "pending_orders": stats["orders_pending"],
+                "employees_available": stats["employees_available"],
+                "retailers_available": stats["retailers_available"],
             },
             status=status.HTTP_200_OK,
         )
     except Exception as e:
         return Response({"error": "Something went wrong"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+# ✅ Dashboard Statistics (Admin Only)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsAdminUser])
+@conditional_response(ORDERS, SHIPMENTS, PRODUCTS, TRUCKS, EMPLOYEES, RETAILERS)
+@cached_response(ORDERS, SHIPMENTS, PRODUCTS, TRUCKS, EMPLOYEES, RETAILERS)
+def get_dashboard_stats(request):
+    """
+    Every registered dashboard KPI (see app/dashboard.py) in one query.
+    ``?kpis=orders_pending,idle_trucks`` limits the figures returned.
+    """
+    kpis = request.GET.get("kpis")
+    try:
+        stats = dashboard_stats(kpis.split(",") if kpis else None)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(stats)
+
 @api_view(["GET"])
 @permission_classes([IsAdminUser])
 def get_users(request):
@@ -327,22 +593,49 @@ def update_shipment_status(request):
         return Response({"error": "shipment_id and status are required"}, status=status.HTTP_400_BAD_REQUEST)
 
     # Validate status choices
-    valid_statuses = ['in_transit', 'delivered', 'failed']
-    if new_status not in valid_statuses:
+    if new_status not in SHIPMENT_STATUSES:
         return Response({"error": "Invalid status"}, status=status.HTTP_400_BAD_REQUEST)
 
     # Find the shipment assigned to this employee
-    try:
-        shipment = Shipment.objects.get(shipment_id=shipment_id, employee__user__username=username)
-    except Shipment.DoesNotExist:
+    employee = Employee.objects.filter(user__username=username).first()
+    if employee is None or not Shipment.objects.filter(shipment_id=shipment_id, employee=employee).exists():
         return Response({"error": "Shipment not found or unauthorized"}, status=status.HTTP_404_NOT_FOUND)
 
-    # Update shipment status
-    shipment.status = new_status
-    shipment.save()
+    # Update shipment status, with the order, product and truck, in one transaction
+    try:
+        update_shipment_statuses({int(shipment_id): new_status}, employee=employee)
+    except DeliveryError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     return Response({"message": "Shipment status updated successfully"}, status=status.HTTP_200_OK)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated,IsEmployeeUser])
+def update_shipment_statuses_view(request):
+    """
+    Lets an employee update many of their shipments at once, e.g. when closing out a route.
+
+    Body: {"updates": [{"shipment_id": 1, "status": "delivered"}, ...]}
+    All updates are applied in one transaction, or none if any of them is invalid.
+    """
+    try:
+        updates = {int(update["shipment_id"]): update["status"] for update in request.data.get("updates", [])}
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return Response({"error": "Each update needs a shipment_id and a status"}, status=status.HTTP_400_BAD_REQUEST)
+    if not updates:
+        return Response({"error": "No updates given"}, status=status.HTTP_400_BAD_REQUEST)
+
+    employee = Employee.objects.filter(user=request.user).first()
+    if employee is None:
+        return Response({"error": "No employee profile for this user"}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        changed = update_shipment_statuses(updates, employee=employee)
+    except DeliveryError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({"updated": len(updates), "changed": changed}, status=status.HTTP_200_OK)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated,IsEmployeeUser])
 def get_employee_orders(request):
@@ -369,6 +662,9 @@ def redirect_view(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsAdminUser])
+# Multi-object admin deletes log in bulk (no LogEntry signal), but the deleted rows signal their own resource
+@conditional_response(ADMIN_LOG, ORDERS, SHIPMENTS, PRODUCTS, CATEGORIES, EMPLOYEES, RETAILERS)
+@cached_response(ADMIN_LOG, ORDERS, SHIPMENTS, PRODUCTS, CATEGORIES, EMPLOYEES, RETAILERS)
 def recent_actions(request):
     # Fetch the last 10 actions performed in the admin panel
     actions = LogEntry.objects.select_related('content_type', 'user').order_by('-action_time')[:10]
@@ -403,6 +699,9 @@ def get_employee_id(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsAdminUser])
+# Multi-object admin deletes log in bulk (no LogEntry signal), but the deleted rows signal their own resource
+@conditional_response(ADMIN_LOG, ORDERS, SHIPMENTS, PRODUCTS, CATEGORIES, EMPLOYEES, RETAILERS)
+@cached_response(ADMIN_LOG, ORDERS, SHIPMENTS, PRODUCTS, CATEGORIES, EMPLOYEES, RETAILERS)
 def recent_actions(request):
     # Fetch the last 10 actions performed in the admin panel
     actions = LogEntry.objects.select_related('content_type', 'user').order_by('-action_time')[:10]
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -91,6 +92,16 @@ DATABASES = {
     }
 }
 
+# Set USE_SQLITE=1 to work against a local SQLite file instead, e.g. when running
+# the seed_data and benchmark_allocation management commands on a laptop.
+if os.environ.get('USE_SQLITE'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -142,6 +153,34 @@ REST_FRAMEWORK = {
     )
 }
 
+# Place new orders and freed trucks as soon as they appear (see app/allocation.py).
+# A full pass through /api/allocate-orders/ is still available for reconciliation.
+INCREMENTAL_ALLOCATION = True
+
+# Dashboard responses are cached until the data they read changes (see app/cache.py).
+# Entries are keyed on versions kept in the database, so a per-process cache never
+# serves data another process changed; set CACHE_REDIS_URL to let processes share entries.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'smartchain',
+    }
+}
+if os.environ.get('CACHE_REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['CACHE_REDIS_URL'],
+    }
+DASHBOARD_CACHE_TIMEOUT = 600  # Seconds; changed data is never served, this only bounds memory
+
+# Stock alerts are always stored (see app/alerts.py); set a topic to also publish them over MQTT
+STOCK_ALERT_MQTT_TOPIC = os.environ.get("STOCK_ALERT_MQTT_TOPIC")  # e.g. "manufacturing/stock-alerts"
+STOCK_ALERT_MQTT_BROKER = os.environ.get("STOCK_ALERT_MQTT_BROKER", "broker.emqx.io")
+STOCK_ALERT_MQTT_PORT = int(os.environ.get("STOCK_ALERT_MQTT_PORT", 1883))
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",  # Change this to match your frontend URL
-]
\ No newline at end of file
+]
+
+# Let the frontend read the validators of conditional GETs (see app/cache.py)
+CORS_EXPOSE_HEADERS = ["ETag", "Last-Modified"]